@@ -26,6 +26,8 @@ from plumbing.cache       import property_cached
 
 # Internal modules #
 from cbmcfs3_runner.core.country import Country
+from cbmcfs3_runner.core.results_store import ResultsStore
+from cbmcfs3_runner.disturbances.silviculture import SilvicultureBatch
 from cbmcfs3_runner.scenarios import scen_classes
 
 # Where is the data, default case #
@@ -51,6 +53,7 @@ class Continent(object):
     /countries/
     /scenarios/
     /reports/
+    /results/
     """
 
     def __init__(self, base_dir):
@@ -89,6 +92,16 @@ class Continent(object):
         all_scenarios = [Scen(self) for Scen in scen_classes]
         return {s.short_name: s for s in all_scenarios}
 
+    @property_cached
+    def results_store(self):
+        """The partitioned store of post-processing outputs of all scenarios."""
+        return ResultsStore(self)
+
+    @property_cached
+    def silviculture_batch(self):
+        """Compute the harvest proportions of all countries at once."""
+        return SilvicultureBatch(self)
+
     def run_scenarios(self, verbose=True):
         """Run all scenarios for all countries in continent."""
         for scenario in self.scenarios.values():
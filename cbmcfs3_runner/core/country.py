@@ -203,8 +203,7 @@ class Country(object):
     @property_cached
     def faostat(self):
         """Load the faostat forestry dataset of this country."""
-        df = faostat.forestry.query('country == "%s"' % self.iso2_code)
-        return df.drop(columns='country')
+        return faostat.country(self.iso2_code)
 
     @property_cached
     def scenarios(self):
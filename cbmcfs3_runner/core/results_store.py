@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+You can use this object like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> store = continent.results_store
+    >>> store(scenarios=['static_demand', 'demand_plus_20'])
+    >>> df = store.query('ipcc_pools',
+    ...                  scenarios = ['static_demand', 'demand_plus_20'],
+    ...                  years     = [2030])
+"""
+
+# Built-in modules #
+from operator import attrgetter
+
+# Third party modules #
+import pandas
+from tqdm import tqdm
+
+# First party modules #
+
+# Internal modules #
+
+###############################################################################
+class ResultsStore(object):
+    """
+    A continent-level store of the standard post-processing outputs.
+
+    Each table is saved as a Parquet dataset partitioned by scenario and
+    country with the 'hive' directory layout, for instance:
+
+        results/ipcc_pools/scenario=static_demand/country=AT/part.parquet
+
+    Inside every file the rows are sorted by year and split into row groups
+    so that a query can skip, thanks to the statistics kept in the file,
+    everything that does not match. In the end a query filtering on
+    scenario, country and year only reads the row groups it needs instead of
+    re-opening and re-computing the post processor of every runner.
+    """
+
+    # Table name and attribute path relative to the post processor #
+    tables = {
+        'ipcc_pools':            'ipcc.pool_indicators_long',
+        'harvest_exp_prov_vol':  'harvest.exp_prov_by_volume',
+        'harvest_exp_prov_area': 'harvest.exp_prov_by_area',
+        'inventory_bins':        'inventory.bins_per_year',
+        'hwp':                   'products.hwp',
+        'merch_stock':           'inventory.sum_merch_stock',
+    }
+
+    # Number of rows in each row group #
+    row_group_size = 65536
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.base_dir)
+
+    def __init__(self, continent):
+        # Save parent #
+        self.continent = continent
+        # The directory containing one dataset per table #
+        self.base_dir = continent.paths.results_dir
+
+    def __call__(self, scenarios=None, countries=None, tables=None):
+        """
+        Update the store with the results of the last runner of every
+        country in the given scenarios (by default all of them).
+        Runners that don't have any output yet are skipped.
+        """
+        # Default values #
+        if scenarios is None: scenarios = self.continent.scenarios.keys()
+        if countries is None: countries = self.continent.countries.keys()
+        # Iterate #
+        for scen_name in scenarios:
+            scenario = self.continent.scenarios[scen_name]
+            for iso in tqdm(countries, desc=scen_name):
+                runner = scenario.runners[iso][-1]
+                if not runner.post_processor.paths.mdb.exists: continue
+                self.add_runner(runner, tables)
+
+    def table_dir(self, table):
+        """The directory of the dataset containing one table."""
+        return self.base_dir + table + '/'
+
+    def partition_dir(self, table, scenario, country):
+        """The directory of one scenario and one country in a dataset."""
+        return self.table_dir(table) + 'scenario=%s/country=%s/' % (scenario, country)
+
+    def add_runner(self, runner, tables=None):
+        """Write (or overwrite) the results of one runner in the store."""
+        # Default value #
+        if tables is None: tables = self.tables.keys()
+        # Iterate #
+        for table in tables:
+            df = attrgetter(self.tables[table])(runner.post_processor)
+            self.write(df, table, runner.scenario.short_name, runner.country.iso2_code)
+
+    def write(self, df, table, scenario, country):
+        """Write one data frame as the partition of a given scenario and country."""
+        # Sort so that row group statistics on years are tight #
+        if 'year' in df.columns: df = df.sort_values('year', kind='mergesort')
+        # Replace the previous partition #
+        directory = self.partition_dir(table, scenario, country)
+        directory.remove()
+        directory.create()
+        # Write #
+        df.to_parquet(str(directory + 'part.parquet'),
+                      engine         = 'pyarrow',
+                      index          = False,
+                      row_group_size = self.row_group_size)
+
+    def query(self, table, scenarios=None, countries=None, years=None,
+              columns=None, filters=None):
+        """
+        Read a table from the store. All conditions are pushed down to the
+        Parquet reader so that only the matching partitions and row groups
+        are read. Extra conditions can be given as a list of tuples in the
+        format of `pyarrow.parquet.read_table`, for instance:
+
+            filters = [('forest_type', '=', 'FS')]
+
+        The 'scenario' and 'country' columns are added from the partitions.
+        """
+        # Collect all conditions #
+        conditions = list(filters or [])
+        if scenarios is not None: conditions.append(('scenario', 'in', list(scenarios)))
+        if countries is not None: conditions.append(('country',  'in', list(countries)))
+        if years     is not None: conditions.append(('year',     'in', list(years)))
+        # Read #
+        df = pandas.read_parquet(str(self.table_dir(table)),
+                                 engine  = 'pyarrow',
+                                 columns = columns,
+                                 filters = conditions or None)
+        # Return #
+        return df
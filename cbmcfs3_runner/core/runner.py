@@ -31,6 +31,7 @@ from cbmcfs3_runner.pump.pre_flight                import PreFlight
 from cbmcfs3_runner.reports.runner                 import RunnerReport
 from cbmcfs3_runner.stdrd_import_tool.launch_sit   import DefaultSIT, AppendSIT
 from cbmcfs3_runner.external_tools.launch_cbm      import LaunchCBM
+from cbmcfs3_runner.pump.log_reader                import scan
 
 # Constants #
 home = os.environ.get('HOME', '~') + '/'
@@ -194,9 +195,10 @@ class Runner(object):
         within the pipeline. This can be used to plot the country on a
         color scale map.
         """
-        if   'run is completed' in self.paths.log.contents: return 1.0
-        elif 'SIT created'      in self.paths.log.contents: return 0.5
-        else:                                               return 0.0
+        found = scan(self.paths.log, {'cbm': 'run is completed', 'sit': 'SIT created'})
+        if   found['cbm']: return 1.0
+        elif found['sit']: return 0.5
+        else:              return 0.0
 
     @property_cached
     def graphs(self):
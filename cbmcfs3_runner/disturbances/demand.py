@@ -35,6 +35,120 @@ new_names = ['LU',  'SE', 'SI']
 fixed_names = gftm_fw_demand['country_iso2'].replace(old_names, new_names)
 gftm_fw_demand['country_iso2'] = fixed_names
 
+###############################################################################
+class GftmDemand(object):
+    """
+    Reshapes the GFTM files of all countries at once into tidy long tables
+    indexed on ['country_iso2', 'year', 'hwp'] with the columns
+    ['value_ub', 'value_ob']. The 5 year periods of GFTM are already
+    expanded to one row per year.
+
+    Each `Country.demand` then only takes its slice of these tables
+    instead of parsing the wide files again. You can use it like this:
+
+        >>> from cbmcfs3_runner.disturbances.demand import gftm_demand
+        >>> print(gftm_demand.irw.loc['AT'])
+    """
+
+    # Convert under bark demand volumes to over bark using this factor #
+    bark_correction_factor = 0.88
+
+    # The variable and periods we keep from the GFTM file #
+    irw_variable  = 'Annual  production (m3ub) - from GFTM'
+    years_to_keep = ['2016 to 2020', '2021 to 2025', '2026 to 2030']
+
+    # Log and pulpwood are summed together for each HWP #
+    irw_products = {'C log': 'irw_c', 'C pulpwood': 'irw_c',
+                    'N log': 'irw_b', 'N pulpwood': 'irw_b'}
+
+    # Fuel wood products are renamed to HWP #
+    fw_products = {'coniferous': 'fw_c', 'broadleaved': 'fw_b'}
+
+    # Every period of GFTM lasts this many years #
+    period_length = 5
+
+    index = ['country_iso2', 'year', 'hwp']
+
+    def expand_years(self, df):
+        """
+        Repeat every row for each successive year within its period,
+        starting at 'year_min'. Then compute the over bark values and
+        set the index.
+        """
+        df = df.loc[df.index.repeat(self.period_length)]
+        offset = numpy.tile(numpy.arange(self.period_length), len(df) // self.period_length)
+        df = df.assign(year     = df['year_min'].values + offset,
+                       value_ob = df['value_ub'] / self.bark_correction_factor)
+        return df.set_index(self.index)[['value_ub', 'value_ob']].sort_index()
+
+    @property_cached
+    def irw(self):
+        """
+        Future IRW demand of all countries as predicted by GFTM.
+        The first three rows of the file are a header giving the variable,
+        the period and the product of each column. We select the columns
+        of interest once and read them for every country in one go.
+        """
+        # The header, one row per column of the original file #
+        header = gftm_irw_demand[0:3].ffill(axis=1).transpose()
+        header.columns = ['variable', 'year_text', 'product']
+        # Correct an inconsistency in the year range #
+        header['year_text'] = header['year_text'].replace('2016to 2020', '2016 to 2020')
+        # Filter for years with data and select the variable of interest #
+        selector = ((header['variable'] == self.irw_variable)
+                    & header['year_text'].isin(self.years_to_keep)
+                    & header['product'].isin(list(self.irw_products)))
+        header = header.loc[selector]
+        # The content, one row per country #
+        content = gftm_irw_demand[3:]
+        values  = content[header.index]
+        # Drop special characters and switch to number #
+        clean  = lambda s: pandas.to_numeric(s.astype(str).str.strip('%').str.replace("'", ''))
+        values = values.apply(clean).fillna(0.0)
+        # Reshape to long format #
+        num_countries, num_columns = values.shape
+        df = pandas.DataFrame({
+            'country_iso2': numpy.repeat(content[0].values, num_columns),
+            'year_text':    numpy.tile(header['year_text'].values, num_countries),
+            'hwp':          numpy.tile(header['product'].map(self.irw_products).values, num_countries),
+            'value_ub':     values.values.ravel().astype(float)})
+        # Aggregate the log and pulpwood values by HWP #
+        df = (df.groupby(['country_iso2', 'year_text', 'hwp'])
+                .agg({'value_ub': 'sum'})
+                .reset_index())
+        df['year_min'] = df['year_text'].str[:4].astype(int)
+        # Return #
+        return self.expand_years(df)
+
+    @property_cached
+    def fw(self):
+        """
+        Future FW demand of all countries as predicted by GFTM. Using the
+        historical proportion of fuel wood with respect to industrial
+        round wood.
+        """
+        # Reshape to long format #
+        df = gftm_fw_demand.melt(id_vars='country_iso2', var_name='product_year',
+                                 value_name='value_ub')
+        # Separate the hwp and year_min columns  #
+        split = df['product_year'].str.split('_', n=1, expand=True)
+        df['hwp']      = split[0].replace(self.fw_products)
+        df['year_min'] = split[1].astype(int) + 1
+        # Limit fw year to 2026 equal to the maximum of irw years #
+        df = df.query('year_min<2030').reset_index(drop=True)
+        # Return #
+        return self.expand_years(df)
+
+    def country(self, table, iso2_code):
+        """The rows of one table for one country as a flat data frame."""
+        table = getattr(self, table)
+        if iso2_code not in table.index.unique('country_iso2'): table = table.iloc[0:0]
+        else: table = table.loc[[iso2_code]]
+        return table.reset_index()
+
+# A singleton #
+gftm_demand = GftmDemand()
+
 ###############################################################################
 class Demand(object):
     """
@@ -58,161 +172,49 @@ class Demand(object):
     unknown reason.
     """
 
-    # This value ... #
-    bark_correction_factor = 0.88
-
     def __init__(self, parent):
         # Default attributes #
         self.parent = parent
 
-    @property_cached
-    def year_expansion(self):
-        """
-        Create a little data frame to expand years
-        from a 5 year time frame to a yearly time frame.
-
-        GFTM gives a yearly demand over a 5 year interval in
-        cubic meters under bark.
-
-        We will use this data frame to duplicate the yearly demand
-        volume 5 times. This will then be used to generate disturbances.
-
-        Columns are: ['year_min', 'year']
-        """
-        year_min = numpy.concatenate([numpy.repeat(x,5) for x in range(2016, 2030, 5)])
-        df = pandas.DataFrame({'year_min': year_min,
-                               'year':     range(2016, 2031, 1)})
-        df['year'] = df['year'].astype(int)
-        # Convert year to time step #
-        df['step'] = self.parent.year_to_timestep(df['year'])
-        return df
-
-    @property
-    def gftm_header(self):
-       return gftm_irw_demand[0:3]
-
-    @property
-    def gftm_content(self):
-        return gftm_irw_demand[3:]
-
-    @property_cached
-    def gftm_row(self):
-        """Get the row corresponding to the current country."""
-        selector = self.gftm_content[0] == self.parent.iso2_code
-        return self.gftm_content.loc[selector].copy()
-
     columns_of_interest = ['year', 'step', 'hwp', 'value_ub', 'value_ob']
 
     @property_cached
     def gftm_irw(self):
         """
-        Future IRW demand as predicted by GFTM.
-        Load and reshape the data frame in long format.
+        Future IRW demand as predicted by GFTM, sliced from the continent
+        wide table in `gftm_demand.irw` (see the `GftmDemand` class).
 
-        Now we have a yearly demand over a 5 year interval in
+        We have a yearly demand over a 5 year interval in
         cubic meters over bark (column `value_ob`).
 
         Columns are:
 
-            ['year_min', 'year_text', 'hwp', 'value_ob', 'year_max', 'year', 'step']
+            ['year', 'step', 'hwp', 'value_ub', 'value_ob']
         """
-        # Fill values #
-        header = self.gftm_header.fillna(method='ffill', axis=1)
-        # Get the headers #
-        df = pandas.concat([header, self.gftm_row])
-        # Transpose #
-        df = df.transpose()
-        # Drop country code and country name #
-        df = df.drop([0,1])
-        # New index #
-        df = df.set_index([0,1,2])
-        # New column name #
-        df = df.rename(columns={df.columns[0]: 'value'})
-        # Drop special characters #
-        df['value'] = df['value'].str.strip('%')
-        df['value'] = df['value'].str.replace("'", '')
-        # Switch to number #
-        df['value'] = pandas.to_numeric(df['value'])
-        df['value'] = df['value'].fillna(0.0)
-        df = (df.reset_index()
-              .rename(columns = {0: 'variable',
-                                 1: 'year',
-                                 2: 'product'}))
-        # Correct an inconsistency in the year range #
-        df['year'] = df['year'].replace('2016to 2020', '2016 to 2020')
-        # Filter for years with data and select the variable of interest #
-        years_to_keep = ['2016 to 2020', '2021 to 2025', '2026 to 2030']
-        variable      = 'Annual  production (m3ub) - from GFTM'
-        df = df.query("variable==@variable & year in @years_to_keep").copy()
-        # Convert under bark demand volumes to over bark using a correction factor #
-        df['value_ub'] = df['value']
-        df['value_ob'] = df['value'] / self.bark_correction_factor
-        df = df.drop(columns=['value'])
-        # Sum log and pulpwood #
-        # Create a little data frame to rename products to HWP #
-        gftm_irw_names = pandas.DataFrame({'product': ['C log', 'C pulpwood',
-                                                       'N log', 'N pulpwood'],
-                                           'hwp':     ['irw_c', 'irw_c',
-                                                       'irw_b', 'irw_b']})
-        df = (df
-              # Rename products to HWP #
-              .set_index('product')
-              .join(gftm_irw_names.set_index('product'))
-              # Aggregate the log and pulpwood values by HWP #
-              .groupby(['year', 'hwp'])
-              .agg({'value_ob': sum,
-                    'value_ub': sum})
-              .reset_index())
-        df['year_min'] = df['year'].str[:4].astype(int)
-        df['year_max'] = df['year'].str[-4:].astype(int)
-        # Rename year column, because a new year column will be created later
-        # when expanding the years
-        df = df.rename(columns={'year': 'year_text'})
-        # Repeat lines for each successive year within a range by
-        # joining the year_expansion data frame
-        df = df.left_join(self.year_expansion, 'year_min')
+        df = gftm_demand.country('irw', self.parent.iso2_code)
+        # Convert year to time step #
+        df['step'] = self.parent.year_to_timestep(df['year'])
         # Return #
         return df[self.columns_of_interest]
 
     @property_cached
     def gftm_fw(self):
         """
-        Future FW demand as predicted by GFTM. Using the historical
-        proportion of fuel wood with respect to industrial round wood.
-        Load and reshape the data frame in long format.
+        Future FW demand as predicted by GFTM, sliced from the continent
+        wide table in `gftm_demand.fw` (see the `GftmDemand` class).
 
         Columns are:
 
-            ['year_min', 'country_iso2', 'product_year', 'value', 'hwp', 'value_ob',
-             'year', 'step'],
+            ['year', 'step', 'hwp', 'value_ub', 'value_ob']
         """
-        # Get the row corresponding to the current country #
-        selector = gftm_fw_demand['country_iso2'] == self.parent.iso2_code
+        df = gftm_demand.country('fw', self.parent.iso2_code)
         # Check there is something to find for this country #
-        if not any(selector):
+        if df.empty:
             msg = f'No fuel wood data for {self.parent.iso2_code} ' \
                   f'in "{gftm_fw_demand_path}".'
             raise pandas.errors.EmptyDataError(msg)
-        # Copy only the current country #
-        fw_wide = gftm_fw_demand.loc[selector].copy()
-        # Reshape to long format #
-        df = fw_wide.melt(id_vars='country_iso2', var_name='product_year',
-                          value_name='value')
-        # Separate the hwp and year_min columns  #
-        df['hwp'], df['year_min'] = df['product_year'].str.split('_', 1).str
-        # Rename #
-        df['hwp'] = df['hwp'].replace(['coniferous', 'broadleaved'],
-                                      ['fw_c', 'fw_b'])
-        df['year_min'] = df['year_min'].astype(int) + 1
-        # Limit fw year to 2026 equal to the maximum of irw years #
-        df = df.query('year_min<2030').copy()
-        # Convert demand value to over bark #
-        df['value_ub'] = df['value']
-        df['value_ob'] = df['value'] / self.bark_correction_factor
-        df = df.drop(columns=['value'])
-        # Repeat lines for each successive year within a range by
-        # joining the year_expansion data frame
-        df = df.left_join(self.year_expansion, 'year_min')
+        # Convert year to time step #
+        df['step'] = self.parent.year_to_timestep(df['year'])
         # Return #
         return df[self.columns_of_interest]
 
@@ -19,6 +19,115 @@ from plumbing.cache import property_cached
 
 # Internal modules #
 
+# Classifiers used to join the treatments with the stock #
+silv_classifiers = ['status', 'forest_type', 'management_type',
+                    'management_strategy', 'conifers_broadleaves']
+
+# Variables kept when aggregating because we need them to create disturbances #
+vars_to_create_dists = ['sort_type', 'efficiency', 'min_age', 'max_age',
+                        'min_since_last', 'max_since_last',
+                        'regen_delay', 'reset_age', 'wd',
+                        'owc_perc', 'snag_perc', 'man_nat']
+
+###############################################################################
+# These functions are the steps of the harvest proportion computation.
+# They are used by `Silviculture` for one country, and by `SilvicultureBatch`
+# for many countries at once, in which case `keys` contains the column that
+# identifies the country of each row.
+
+def stock_based_on_yield(inventory, h_yields_long, names, keys=()):
+    """The stock of every inventory row, see `Silviculture.stock_based_on_yield`."""
+    df = inventory.copy()
+    # Compute a proxy for the actual age #
+    df['age_proxy'] = numpy.where(df['using_id'],
+                                  df['age_class'] * 10 - 5,
+                                  df['age'])
+    # Add missing age_class column for Greece.
+    # Use age_proxy (instead of age ) as this is guaranteed
+    # to be an integer value
+    df['age_class'] = numpy.where(df['using_id'],
+                                  df['age_class'],
+                                  df['age_proxy']/10)
+    # Index #
+    index = list(keys) + list(names) + ['age_class']
+    # Join #
+    df = df.left_join(h_yields_long, index)
+    # Compute stock in m^3 #
+    # Area is in hectares
+    # Volume is in m^3 / hectares
+    df['stock'] = df['area'] * df['volume']
+    # We are not interested in these columns #
+    cols_to_drop = ['age', 'using_id', 'delay', 'unfcccl',
+                    'hist_dist', 'last_dist', 'sp']
+    return df.drop(columns=cols_to_drop)
+
+def treatments_corr(treatments, corr_fact, keys=()):
+    """
+    Join the treatments with the correction factors.
+    The corr_fact data frame sometimes has extra classifiers.
+    """
+    join_columns = sorted(set(corr_fact.columns) - {'corr_fact'} - set(keys))
+    return treatments.left_join(corr_fact, list(keys) + join_columns)
+
+def stock_available_by_age(stock_by_yield, treats_corr, step_at_base, keys=()):
+    """
+    The stock available, see `Silviculture.stock_available_by_age`.
+    With `keys`, the `step_at_base` is a dictionary of key values to steps.
+    """
+    # Now join only on these classifiers #
+    df = stock_by_yield.left_join(treats_corr, list(keys) + silv_classifiers)
+    # Filter for age conditions at the base year #
+    if keys: step_at_base = df[keys[0]].map(step_at_base)
+    df['age_base'] = df['age_proxy'] + step_at_base
+    df['max_age_base'] = df['max_age'] + step_at_base
+    # The age at the base period should be:
+    # * greater than min_age
+    # * and smaller than max age plus step_at_base
+    # This information is only used to calculate the harvest proportion
+    # We had to do this because we cannot change the disturbance min age and
+    # max age otherwise this would change the behaviour of the disturbances.
+    df = df.query('min_age <= age_base & age_base <= max_age_base').copy()
+    # Filter for existing stock #
+    df = df.query('stock > 0').copy()
+    # Compute the stock available #
+    df['stock_available'] = (df['stock']
+                             * df['corr_fact']
+                             * df['perc_merch_biom_rem']
+                             / df['min_since_last'])
+    return df
+
+def stock_available_agg(stock_by_age, keys=()):
+    """The stock available summed over age classes, see `Silviculture.stock_available_agg`."""
+    # Note the presence of 'hwp' as an additional classifier in the index #
+    index = list(keys) + silv_classifiers + ['dist_type_name', 'hwp']
+    # Aggregate #
+    return (stock_by_age
+            .query("man_nat=='Man'")
+            .groupby(index + vars_to_create_dists, observed=True)
+            .agg({'stock_available': 'sum'})
+            .reset_index())
+
+def harvest_proportion(stock_agg, coefs, keys=()):
+    """The proportion of each HWP, see `Silviculture.harvest_proportion`."""
+    df = stock_agg.copy()
+    # Add aggregated column `stock_tot`
+    # Note: we want to keep unaggregated columns in the df,
+    # so we cannot use groupby().agg() below.
+    df['stock_tot'] = df.groupby(list(keys) + ['hwp'])['stock_available'].transform('sum')
+    # Add column prop #
+    df['prop'] = df['stock_available'] / df['stock_tot']
+    # Add coefficient of conversion from m^3 to tonnes of C
+    return df.left_join(coefs, list(keys) + ['forest_type'], validate='many_to_one')
+
+def finish_harvest_proportion(df, classifiers):
+    """
+    The last step, always done for one country: use the categorical data
+    types of its classifiers and sort for readability. The sort is stable
+    so that rows of the same HWP keep their order.
+    """
+    df = classifiers.apply_dtypes(df)
+    return df.sort_values(by=['hwp'], ascending=False, kind='stable')
+
 ###############################################################################
 class Silviculture(object):
     """
@@ -79,15 +188,16 @@ class Silviculture(object):
         df = df.rename(columns = self.parent.classifiers.mapping)
         # The column `dist_type_name` can be loaded as either an int or a str,
         # so convert to string to prevent issues when merging and filtering
-        df['dist_type_name']      = df['dist_type_name'].astype(str)
-        df['management_strategy'] = df['management_strategy'].astype(str)
-        df['management_type']     = df['management_type'].astype(str)
+        # The classifier columns are converted by `apply_dtypes` below
+        df['dist_type_name'] = df['dist_type_name'].astype(str)
         # If 'CC' is present in inventory (and there are no 'For'), then do nothing
         # If 'For' is present in the inventory (and there are no 'CC'), then
         # replace 'CC' by 'For' in the silviculture treatments.
         if any(self.parent.orig_data.inventory['status'] == 'For'):
             assert not any(self.parent.orig_data.inventory['status'] == 'CC')
             df.loc[df['status'] == 'CC', 'status'] = 'For'
+        # Use categorical data types for classifiers #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
@@ -120,33 +230,9 @@ class Silviculture(object):
                       'conifers_broadleaves', 'age_class', 'area', 'volume',
                       'stock', 'age']
         """
-        # Load data frames #
-        df = self.parent.orig_data.inventory.copy()
-        h_yields_long = self.parent.orig_data.historical_yields_long
-        # Compute a proxy for the actual age #
-        df['age_proxy'] = numpy.where(df['using_id'],
-                                      df['age_class'] * 10 - 5,
-                                      df['age'])
-        # Add missing age_class column for Greece.
-        # Use age_proxy (instead of age ) as this is guaranteed
-        # to be an integer value
-        df['age_class'] = numpy.where(df['using_id'],
-                                      df['age_class'],
-                                      df['age_proxy']/10)
-        # Index #
-        index = self.parent.classifiers.names + ['age_class']
-        # Join #
-        df = df.left_join(h_yields_long, index)
-        # Compute stock in m^3 #
-        # Area is in hectares
-        # Volume is in m^3 / hectares
-        df['stock'] = df['area'] * df['volume']
-        # We are not interested in these columns #
-        cols_to_drop = ['age', 'using_id', 'delay', 'unfcccl',
-                        'hist_dist', 'last_dist', 'sp']
-        df = df.drop(columns=cols_to_drop)
-        # Return #
-        return df
+        return stock_based_on_yield(self.parent.orig_data.inventory,
+                                    self.parent.orig_data.historical_yields_long,
+                                    self.parent.classifiers.names)
 
     @property_cached
     def stock_available_by_age(self):
@@ -188,39 +274,9 @@ class Silviculture(object):
         We want to come back 10 times less often to the first stand.
         That is why we divide its proportion by min_since_last here below.
         """
-        # Load data frames used here #
-        treatments     = self.treatments
-        corr_fact      = self.corr_fact
-        stock_by_yield = self.stock_based_on_yield
-        # Join treatments with correction factor #
-        # The corr_fact data frame sometimes has extra classifiers
-        join_columns = set(corr_fact.columns) - {'corr_fact'}
-        treats_corr  = treatments.left_join(corr_fact, join_columns)
-        # Now join only on these classifiers #
-        index = ['status', 'forest_type', 'management_type',
-                 'management_strategy', 'conifers_broadleaves']
-        # Join with treats_corr #
-        df = stock_by_yield.left_join(treats_corr, index)
-        # Filter for age conditions at the base year #
+        treats_corr  = treatments_corr(self.treatments, self.corr_fact)
         step_at_base = self.parent.year_to_timestep(self.parent.base_year)
-        df['age_base'] = df['age_proxy'] + step_at_base
-        df['max_age_base'] = df['max_age'] + step_at_base
-        # The age at the base period should be:
-        # * greater than min_age
-        # * and smaller than max age plus step_at_base
-        # This information is only used to calculate the harvest proportion
-        # We had to do this because we cannot change the disturbance min age and
-        # max age otherwise this would change the behaviour of the disturbances.
-        df = df.query('min_age <= age_base & age_base <= max_age_base').copy()
-        # Filter for existing stock #
-        df = df.query('stock > 0').copy()
-        # Compute the stock available #
-        df['stock_available'] = (df['stock']
-                                 * df['corr_fact']
-                                 * df['perc_merch_biom_rem']
-                                 / df['min_since_last'])
-        # Return #
-        return df
+        return stock_available_by_age(self.stock_based_on_yield, treats_corr, step_at_base)
 
     @property_cached
     def stock_available_agg(self):
@@ -232,23 +288,7 @@ class Silviculture(object):
                       'conifers_broadleaves', 'dist_type_name', 'stock_available',
                       'hwp', 'status']
         """
-        # Note the presence of 'hwp' as an additional classifier in the index #
-        index = ['status', 'forest_type', 'management_type', 'management_strategy',
-                 'conifers_broadleaves', 'dist_type_name', 'hwp']
-        # These variables will be added to the `groupby` aggregate operation
-        # because we need them later to create disturbances
-        vars_to_create_dists = ['sort_type', 'efficiency', 'min_age', 'max_age',
-                                'min_since_last', 'max_since_last',
-                                'regen_delay', 'reset_age', 'wd',
-                                'owc_perc', 'snag_perc', 'man_nat']
-        # Aggregate #
-        df = (self.stock_available_by_age
-              .query("man_nat=='Man'")
-              .groupby(index + vars_to_create_dists)
-              .agg({'stock_available': 'sum'})
-              .reset_index())
-        # Return #
-        return df
+        return stock_available_agg(self.stock_available_by_age)
 
     @property_cached
     def harvest_proportion(self):
@@ -292,20 +332,124 @@ class Silviculture(object):
                       'conifers_broadleaves', 'dist_type_name', 'stock_available',
                       'hwp', 'status', 'stock_tot', 'prop']
         """
-        # Load data frames #
-        df    = self.stock_available_agg.copy()
         coefs = self.parent.coefficients[['forest_type', 'density']]
-        # Add aggregated column `stock_tot`
-        # Note: we want to keep unaggregated columns in the df,
-        # so we cannot use groupby().agg() below.
-        df['stock_tot'] = df.groupby(['hwp'])['stock_available'].transform('sum')
-        # Add column prop #
-        df['prop']      = df['stock_available'] / df['stock_tot']
-        # Drop redundant total column #
-        df.drop(columns=['stock_tot'])
-        # Add coefficient of conversion from m^3 to tonnes of C
-        df = df.left_join(coefs, 'forest_type')
-        # Sort for readability #
-        df = df.sort_values(by=['hwp'], ascending=False)
-        # Return
-        return df
+        df    = harvest_proportion(self.stock_available_agg, coefs)
+        return finish_harvest_proportion(df, self.parent.classifiers)
+
+###############################################################################
+class SilvicultureBatch(object):
+    """
+    Computes the harvest proportion of many countries at once.
+
+    The inventories, yields, treatments and correction factors of every
+    country are concatenated with a 'country' key column and the functions
+    used by `Silviculture` (stock_based_on_yield, stock_available_by_age,
+    stock_available_agg and harvest_proportion) are called only once on the
+    large data frames instead of once per country on small ones.
+
+    Since classifiers that a country doesn't have are missing on both
+    sides of the joins, and pandas matches missing keys together, the
+    joins on the classifiers give the same rows as for each country alone.
+    Only the correction factors, whose join columns differ between
+    countries, are joined once per set of columns.
+
+    You can use it like this:
+
+        >>> from cbmcfs3_runner.core.continent import continent
+        >>> continent.silviculture_batch()
+        >>> print(continent.countries['AT'].silviculture.harvest_proportion)
+
+    Calling the object stores each country's result in the cache of its
+    `Silviculture.harvest_proportion` so that the scenarios use it directly.
+    """
+
+    def __repr__(self):
+        return '%s object with %i countries' % (self.__class__, len(self.countries))
+
+    def __init__(self, parent, countries=None):
+        # Default attributes #
+        self.parent = parent
+        # By default all the countries of the continent #
+        if countries is None: countries = list(self.parent.countries.values())
+        self.countries = countries
+
+    def __call__(self):
+        """Store the harvest proportion of every country in its cache."""
+        for country in self.countries:
+            country.silviculture.harvest_proportion = self.harvest_proportions[country.iso2_code]
+
+    # The column identifying each country #
+    keys = ['country']
+
+    def concat(self, countries, get_df):
+        """Concatenate one data frame of every country with a 'country' column."""
+        frames = [get_df(c).assign(country=c.iso2_code) for c in countries]
+        return pandas.concat(frames, ignore_index=True)
+
+    @property_cached
+    def stock_based_on_yield(self):
+        """Same as `Silviculture.stock_based_on_yield` with a 'country' column."""
+        inventory     = self.concat(self.countries, lambda c: c.orig_data.inventory)
+        h_yields_long = self.concat(self.countries, lambda c: c.orig_data.historical_yields_long)
+        # The union of the classifiers of all countries #
+        names = []
+        for country in self.countries:
+            names += [n for n in country.classifiers.names if n not in names]
+        return stock_based_on_yield(inventory, h_yields_long, names, self.keys)
+
+    @property_cached
+    def treats_corr(self):
+        """
+        The treatments joined with the correction factors. The countries
+        are grouped by the columns of their correction factor table.
+        """
+        # Group countries #
+        groups = {}
+        for country in self.countries:
+            join_columns = frozenset(country.silviculture.corr_fact.columns)
+            groups.setdefault(join_columns, []).append(country)
+        # Join each group #
+        result = []
+        for countries in groups.values():
+            treatments = self.concat(countries, lambda c: c.silviculture.treatments)
+            corr_fact  = self.concat(countries, lambda c: c.silviculture.corr_fact)
+            result.append(treatments_corr(treatments, corr_fact, self.keys))
+        return pandas.concat(result, ignore_index=True)
+
+    @property_cached
+    def stock_available_by_age(self):
+        """Same as `Silviculture.stock_available_by_age` with a 'country' column."""
+        step_at_base = {c.iso2_code: c.year_to_timestep(c.base_year) for c in self.countries}
+        return stock_available_by_age(self.stock_based_on_yield, self.treats_corr,
+                                      step_at_base, self.keys)
+
+    @property_cached
+    def stock_available_agg(self):
+        """Same as `Silviculture.stock_available_agg` with a 'country' column."""
+        return stock_available_agg(self.stock_available_by_age, self.keys)
+
+    @property_cached
+    def harvest_proportion(self):
+        """Same as `Silviculture.harvest_proportion` with a 'country' column."""
+        coefs = self.concat(self.countries, lambda c: c.coefficients[['forest_type', 'density']])
+        return harvest_proportion(self.stock_available_agg, coefs, self.keys)
+
+    @property_cached
+    def harvest_proportions(self):
+        """
+        A dictionary of iso2 codes to the harvest proportion of each country,
+        with the same columns, data types and order as when the country
+        is computed alone.
+        """
+        result = {}
+        groups = dict(list(self.harvest_proportion.groupby('country', sort=False)))
+        for country in self.countries:
+            df = groups.get(country.iso2_code, self.harvest_proportion.iloc[0:0])
+            df = df.drop(columns='country').reset_index(drop=True)
+            # Concatenating countries can upcast some of their treatment columns #
+            treatments = country.silviculture.treatments
+            df = df.astype({c: t for c, t in treatments.dtypes.items()
+                            if c in df.columns and c not in country.classifiers.vocabulary})
+            # Same last step as for one country #
+            result[country.iso2_code] = finish_harvest_proportion(df, country.classifiers)
+        return result
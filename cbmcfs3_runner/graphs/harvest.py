@@ -41,7 +41,7 @@ class HarvestExpProv(Graph):
         self.df = self.data.copy()
 
         # Group #
-        self.df = self.df.groupby(self.grp_cols).agg(self.agg_cols).reset_index()
+        self.df = self.df.groupby(self.grp_cols, observed=True).agg(self.agg_cols).reset_index()
 
         # Colors #
         colors = brewer2mpl.get_map('Pastel1', 'qualitative', 3).mpl_colors
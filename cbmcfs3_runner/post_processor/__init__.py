@@ -11,6 +11,8 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
+import numpy, pandas
+from pandas.api.extensions import take
 
 # First party modules #
 from plumbing.databases.access_database import AccessDatabase
@@ -23,6 +25,7 @@ from cbmcfs3_runner.post_processor.harvest      import Harvest
 from cbmcfs3_runner.post_processor.inventory    import Inventory
 from cbmcfs3_runner.post_processor.products     import Products
 from cbmcfs3_runner.post_processor.ipcc         import Ipcc
+from cbmcfs3_runner.post_processor.pool_arrays  import PoolArrays
 
 ###############################################################################
 class PostProcessor(object):
@@ -97,8 +100,8 @@ class PostProcessor(object):
         classifiers = classifiers.rename(columns={'broad_conifers': 'conifers_broadleaves'})
         # C.f the PL column problem #
         classifiers = classifiers.rename(columns={'natural_forest_region': 'management_type'})
-        # Convert to categorical variables
-        classifiers = classifiers.astype('category')
+        # Convert to the categorical variables shared by the whole pipeline #
+        classifiers = self.parent.country.classifiers.apply_dtypes(classifiers, strict=False)
         # Reset the index
         classifiers = classifiers.reset_index()
         # Return result #
@@ -120,7 +123,48 @@ class PostProcessor(object):
                       'management_type', 'management_strategy', 'climatic_unit',
                       'conifers_broadleaves', 'id', 'density', 'harvest_gr']
         """
-        return self.classifiers.left_join(self.coefficients, 'forest_type')
+        return self.classifiers.left_join(self.coefficients, 'forest_type', validate='many_to_one')
+
+    @property_cached
+    def class_set_rows(self):
+        """
+        A dense integer array giving, for every possible value of
+        `user_defd_class_set_id`, its row number in `self.classifiers`
+        (and in `self.classifiers_coefs` which has the same rows), or -1
+        when the class set doesn't exist.
+        """
+        ids    = self.classifiers['user_defd_class_set_id'].to_numpy(dtype='int64')
+        result = numpy.full(ids.max() + 1 if len(ids) else 0, -1, dtype='int64')
+        result[ids] = numpy.arange(len(ids))
+        return result
+
+    def add_classifiers(self, df, coefs=False):
+        """
+        Add the classifier columns (and the coefficients if `coefs` is True)
+        to a table that has a 'user_defd_class_set_id' column. This is a
+        left join, but instead of aligning two indexes we look up the row
+        number of every class set in `self.class_set_rows` and gather the
+        classifier values with `take`. Unknown class sets get missing values.
+        The key column is moved first, as with `left_join`.
+        """
+        # The table to gather from #
+        key   = 'user_defd_class_set_id'
+        table = self.classifiers_coefs if coefs else self.classifiers
+        # Check for overlapping columns like in `left_join` #
+        overlap = (set(df.columns) & set(table.columns)) - {key}
+        if overlap:
+            raise ValueError("Columns overlap: %s" % sorted(overlap))
+        # Row number of every class set, -1 if unknown #
+        lookup = self.class_set_rows
+        ids    = pandas.to_numeric(df[key]).fillna(-1).to_numpy(dtype='int64')
+        known  = (ids >= 0) & (ids < len(lookup))
+        rows   = numpy.where(known, lookup.take(numpy.where(known, ids, 0), mode='clip'), -1)
+        # Gather, filling unknown rows with missing values #
+        columns = {col: take(table[col].array, rows, allow_fill=True)
+                   for col in table.columns if col != key}
+        df = df.assign(**columns)
+        # Put the key column first #
+        return df[[key] + [c for c in df.columns if c != key]]
 
     @property_cached
     def classifiers_mapping(self):
@@ -180,6 +224,8 @@ class PostProcessor(object):
         df = df.rename(columns=lambda n:n.replace('/','_'))
         # dist_type_name is actually dist_type_name #
         df = df.rename(columns = {'dist_type_name': 'dist_type_name'})
+        # Use categorical data types for classifiers #
+        df = self.parent.country.classifiers.apply_dtypes(df, strict=False)
         # Return result #
         return df
 
@@ -192,10 +238,9 @@ class PostProcessor(object):
         # Load tables #
         flux_indicators  = self.database['tblFluxIndicators']
         disturbance_type = self.database['tblDisturbanceType']
-        coefficients     = self.classifiers_coefs
-        # Ungrouped #
-        df = flux_indicators.left_join(disturbance_type, 'dist_type_id')
-        df = df.left_join(coefficients, 'user_defd_class_set_id')
+        # Ungrouped, with exactly one row per row of the database #
+        df = flux_indicators.left_join(disturbance_type, 'dist_type_id', validate='many_to_one')
+        df = self.add_classifiers(df, coefs=True)
         # Return #
         return df
 
@@ -216,18 +261,22 @@ class PostProcessor(object):
     def pool_indicators(self):
         """Load the pool indicators table, add classifiers."""
         # Load tables #
-        pool  = self.database["tblPoolIndicators"]
-        clifr = self.classifiers
-        # Set indexes #
-        index = 'user_defd_class_set_id'
-        pool  = pool.set_index(index)
-        clifr = clifr.set_index(index)
+        pool = self.database["tblPoolIndicators"]
         # Join #
-        df = pool.join(clifr)
-        # Remove index column user_defd_class_set_id
-        df = df.reset_index(drop=True)
+        df = self.add_classifiers(pool)
+        # Remove column user_defd_class_set_id
+        df = df.drop(columns='user_defd_class_set_id')
         return df
 
+    # Identifier columns of the pool indicators that are not pools #
+    pool_ids = ['spuid', 'land_class_id', 'pool_ind_id']
+
+    @property
+    def pool_names(self):
+        """The names of the CBM pools in the pool indicators table."""
+        index = self.classifiers_names + self.pool_ids + ['time_step']
+        return [c for c in self.pool_indicators.columns if c not in index]
+
     # Do not cache since it can be re-computed trivially from the above
     @property
     def pool_indicators_long(self):
@@ -238,9 +287,8 @@ class PostProcessor(object):
         pool name (pool) and the total carbon weight (tc).
         """
         df = self.pool_indicators
-        additional_ids = ['spuid', 'land_class_id', 'pool_ind_id']
         # Pivot to a long format
-        index = self.classifiers_names + additional_ids + ['time_step']
+        index = self.classifiers_names + self.pool_ids + ['time_step']
         df = df.melt(id_vars = index,
                      var_name='pool',
                      value_name='tc')
@@ -266,6 +314,10 @@ class PostProcessor(object):
     def ipcc(self):
         return Ipcc(self)
 
+    @property_cached
+    def pool_arrays(self):
+        return PoolArrays(self)
+
     @property
     def csv_maker(self):
         return CSVMaker(self)
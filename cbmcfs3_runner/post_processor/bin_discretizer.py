@@ -30,7 +30,6 @@ If you just want to test one function:
 import pandas, numpy
 
 # First party modules #
-from plumbing.common import sum_vectors_with_padding
 
 # This value is in years and needs to be confirmed with Scott #
 CBM_BIN_WIDTH = 20.0
@@ -75,18 +74,34 @@ def bin_to_discrete(bin_height, bin_center,
     return vector
 
 ###############################################################################
-def aggregator(df, sum_col, bin_col):
+def aggregator(df, sum_col, bin_col,
+               bin_width = CBM_BIN_WIDTH,
+               precision = CBM_PRECISION):
     """
     The input df is a data frame with multiple rows and
     the grouping columns still present. One must return a numpy
     vector representing the Area per Age. (i.e. the sum_col per bin_col)
+
+    This gives the same result as calling `bin_to_discrete` on every row
+    and summing the vectors with padding, but all rows are processed at
+    once. Each row adds its height per element at its left edge and removes
+    it at its right edge in a difference array, the cumulative sum of which
+    is the total vector.
     """
-    # Helper function #
-    discretizer = lambda row: bin_to_discrete(row[sum_col], row[bin_col])
-    # Get the discretized version of all rows as vectors #
-    all_vectors = [discretizer(row) for i, row in df.iterrows()]
-    # Sum them up vertically to get a single numpy vector #
-    return sum_vectors_with_padding(all_vectors)
+    # Round to precision #
+    bin_radius = int(numpy.round(bin_width / 2 / precision))
+    bin_center = numpy.round(df[bin_col].values / precision).astype(int)
+    # Edges, the left edge is never negative #
+    bin_left  = numpy.maximum(bin_center - bin_radius, 0)
+    bin_right = bin_center + bin_radius
+    # Height of every element of each row #
+    heights = df[sum_col].values / (bin_right - bin_left)
+    # Difference array #
+    diff = numpy.zeros(bin_right.max() + 1)
+    numpy.add.at(diff, bin_left,   heights)
+    numpy.add.at(diff, bin_right, -heights)
+    # The last element only contains the closing of the right edges #
+    return numpy.cumsum(diff[:-1])
 
 ###############################################################################
 ###############################################################################
@@ -128,3 +143,129 @@ def binner(vector, sum_col, bin_width):
     all_bins = generate_bins(vector, bin_width)
     # Make data frame #
     return pandas.DataFrame(all_bins, columns=['age_start', 'age_end', sum_col])
+
+###############################################################################
+def grouped_binner(df, group_cols, sum_col, bin_width, precision = CBM_PRECISION):
+    """
+    Same as calling `binner` on the vector of every row of `df` and
+    concatenating the results, but without any loop over the rows.
+
+    The vectors (stored in the column `sum_col`) are stacked in a 2D array
+    padded with zeros to a multiple of the bin width, and each bin is the sum
+    along the last axis after reshaping. Like in `generate_bins`, each vector
+    keeps only its own number of bins (at least one).
+    Returns a data frame indexed on the `group_cols`.
+    """
+    # Round to precision #
+    width   = int(numpy.round(bin_width / precision))
+    vectors = df[sum_col].values
+    lengths = numpy.array([len(v) for v in vectors], dtype=int)
+    # Number of bins of each vector and in total #
+    counts  = numpy.maximum(-(-lengths // width), 1)
+    num_bins = counts.max() if len(counts) else 0
+    # Scatter all vectors in the padded 2D array #
+    padded  = numpy.zeros((len(vectors), num_bins * width))
+    rows    = numpy.repeat(numpy.arange(len(vectors)), lengths)
+    offsets = numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    cols    = numpy.arange(lengths.sum()) - offsets
+    if len(rows): padded[rows, cols] = numpy.concatenate(vectors)
+    # Sum every bin #
+    sums = padded.reshape(len(vectors), num_bins, width).sum(axis=-1)
+    # Keep only the bins that each vector has #
+    keep  = numpy.arange(num_bins) < counts[:, None]
+    bins  = numpy.nonzero(keep)[1]
+    # Build the data frame #
+    result = pandas.DataFrame({col: numpy.repeat(df[col].values, counts) for col in group_cols})
+    result['age_start'] = (bins * width) * precision
+    result['age_end']   = ((bins + 1) * width) * precision
+    result[sum_col]     = sums[keep]
+    # Return #
+    return result.set_index(group_cols)
+
+###############################################################################
+###############################################################################
+###############################################################################
+def redistribute(df, group_cols, sum_cols, bin_col, bin_width,
+                 mean_cols    = None,
+                 weight_col   = 'area',
+                 source_width = CBM_BIN_WIDTH):
+    """
+    An exact alternative to discretizing every row with `aggregator` and
+    rebinning the vectors with `grouped_binner`.
+
+    Each row of `df` is a uniform bin of width `source_width` centered on
+    `bin_col` (with its left edge clamped at zero). The fraction of it
+    falling in each target bin of width `bin_width` is the length of the
+    overlap divided by the length of the source bin, computed in closed
+    form. Since a source bin only spans a few target bins, we loop over
+    these few offsets and not over rows.
+
+    Several value columns are processed in the same pass:
+
+     * `sum_cols` (a column name or a list of them) are split between the
+       target bins proportionally to the overlap, e.g. 'area'. Their total
+       is conserved exactly for every group.
+     * `mean_cols` are intensive values, e.g. 'biomass' per hectare, that
+       are averaged in each target bin weighted by `weight_col` times the
+       overlap. Missing values are left out of the average.
+
+    Like `grouped_binner`, each group has as many bins as needed to reach
+    its right most edge and the result is indexed on the `group_cols`.
+    """
+    # Default values #
+    if isinstance(sum_cols, str): sum_cols = [sum_cols]
+    if mean_cols is None: mean_cols = []
+    # Number each group, rows with missing group values are dropped #
+    grouped = df.groupby(group_cols, observed=True, sort=True)
+    group   = grouped.ngroup().fillna(-1).astype(int).values
+    keys    = grouped.size().index.to_frame(index=False)
+    valid   = group >= 0
+    group   = group[valid]
+    # Edges of the source bins, the left edge is never negative #
+    center  = df[bin_col].values[valid].astype(float)
+    left    = numpy.maximum(center - source_width / 2, 0.0)
+    right   = center + source_width / 2
+    length  = right - left
+    # The quantities to split: sums, then weighted means and their weights #
+    values  = df[sum_cols + mean_cols].values[valid].astype(float)
+    sums    = numpy.nan_to_num(values[:, :len(sum_cols)])
+    means   = values[:, len(sum_cols):]
+    weights = df[weight_col].values[valid].astype(float)[:, None] * ~numpy.isnan(means)
+    mass    = numpy.hstack([sums, numpy.nan_to_num(means) * weights, weights])
+    # First and last target bin touched by each row #
+    first   = numpy.floor(left / bin_width).astype(int)
+    last    = numpy.maximum(numpy.ceil(right / bin_width).astype(int) - 1, first)
+    # Number of bins of each group #
+    counts  = numpy.ones(len(keys), dtype=int)
+    numpy.maximum.at(counts, group, last + 1)
+    # Accumulate the overlap of every row with the bins it spans #
+    totals = numpy.zeros((len(keys), counts.max() if len(keys) else 0, mass.shape[1]))
+    for offset in range((last - first).max() + 1 if len(group) else 0):
+        target  = first + offset
+        overlap = (numpy.minimum(right, (target + 1) * bin_width) -
+                   numpy.maximum(left,  target      * bin_width))
+        overlap = numpy.clip(overlap, 0.0, None)
+        # A source bin of zero length falls entirely in its first target #
+        frac    = numpy.divide(overlap, length, out=numpy.full(len(length), float(offset == 0)),
+                               where=length > 0)
+        inside  = target <= last
+        numpy.add.at(totals, (group[inside], target[inside]), (mass * frac[:, None])[inside])
+    # Keep only the bins that each group has #
+    keep   = numpy.arange(totals.shape[1]) < counts[:, None]
+    bins   = numpy.nonzero(keep)[1]
+    totals = totals[keep]
+    # Build the data frame #
+    result = pandas.DataFrame({col: numpy.repeat(numpy.asarray(keys[col]), counts)
+                               for col in group_cols})
+    result['age_start'] = bins * bin_width
+    result['age_end']   = (bins + 1) * bin_width
+    for i, col in enumerate(sum_cols): result[col] = totals[:, i]
+    # Divide weighted sums by the weights #
+    num_means = len(mean_cols)
+    weighted  = totals[:, len(sum_cols):len(sum_cols) + num_means]
+    weights   = totals[:, len(sum_cols) + num_means:]
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        for i, col in enumerate(mean_cols):
+            result[col] = numpy.where(weights[:, i] > 0, weighted[:, i] / weights[:, i], numpy.nan)
+    # Return #
+    return result.set_index(group_cols)
@@ -11,7 +11,7 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import numpy
+import numpy, pandas
 
 # First party modules #
 from plumbing.cache import property_cached
@@ -42,15 +42,25 @@ class Harvest(object):
         # Shortcut #
         self.country = self.parent.parent.country
 
+    # The flux columns summed in the harvest cube #
+    flux_columns = ['soft_production', 'hard_production', 'dom_production',
+                    'co2_production', 'merch_litter_input', 'oth_litter_input']
+
     #-------------------------------------------------------------------------#
     @property_cached
-    def check(self):
+    def cube(self):
         """
         Converts flux indicators in tons of carbon to harvested
         wood products volumes in cubic meters of wood.
 
         Based on Roberto's query `Harvest analysis check` visible in the original calibration database.
 
+        This is the finest grain of harvest we use: the flux indicators are
+        grouped once by disturbance type, time step and all the classifiers
+        of the silviculture treatments. The other harvest tables, as well as
+        `Products.hwp_intermediate`, are only roll-ups of this cube, see
+        the `rollup` method.
+
         What are the units?
 
         * TC is in terms of tons of carbon.
@@ -82,20 +92,14 @@ class Harvest(object):
         assert not ungrouped[index].isna().any().any()
         # Then group #
         df = (ungrouped
-              .groupby(index + secondary_index)
-              .agg({'soft_production':    'sum',
-                    'hard_production':    'sum',
-                    'dom_production' :    'sum',
-                    'co2_production' :    'sum',
-                    'merch_litter_input': 'sum',
-                    'oth_litter_input':   'sum'
-                    })
+              .groupby(index + secondary_index, observed=True)
+              .agg(dict.fromkeys(self.flux_columns, 'sum'))
               .reset_index())
         # Check conservation of total mass #
-        flux_raw = self.parent.database['tblFluxIndicators']
+        # The flux indicators have exactly one row per row of the database
+        # so we don't need to read the raw table again
         is_equal = numpy.testing.assert_allclose
-        is_equal(flux_raw['soft_production'].sum(), df['soft_production'].sum())
-        is_equal(flux_raw['hard_production'].sum(), df['hard_production'].sum())
+        for col in self.flux_columns: is_equal(ungrouped[col].sum(), df[col].sum())
         # Create new columns #
         df['tc']                  = df['soft_production'] + df['hard_production']
         df['prov_carbon']         = df['soft_production'] + df['hard_production'] + df['dom_production']
@@ -106,6 +110,18 @@ class Harvest(object):
         # Return #
         return df
 
+    @property
+    def check(self):
+        """The harvest cube, under its original name."""
+        return self.cube
+
+    def rollup(self, index, columns):
+        """Sum the given columns of the harvest cube by the given index."""
+        return (self.cube
+                .groupby(index, observed=True)
+                .agg(dict.fromkeys(columns, 'sum'))
+                .reset_index())
+
     @property_cached
     def prop_sub_merch_snags(self):
         """
@@ -115,18 +131,10 @@ class Harvest(object):
         and generally refers to branches. It is represented by the CO2
         pool in the CBM output.
         """
-        # Load #
-        df = self.check.copy()
         # Aggregate on classifier and dist_type_name only
         # i.e. aggregate over the time step
-        index = self.classifiers_silv.copy()
-        index += ['dist_type_name']
-        df = (df
-              .groupby(index)
-              .agg({'vol_merch':sum,
-                    'vol_sub_merch':sum,
-                    'vol_snags':sum})
-              .reset_index())
+        index = self.classifiers_silv + ['dist_type_name']
+        df = self.rollup(index, ['vol_merch', 'vol_sub_merch', 'vol_snags'])
         # New columns #
         df['prop_sub_merch'] = df['vol_sub_merch'] / df['vol_merch']
         df['prop_snags']     = df['vol_snags']     / df['vol_merch']
@@ -147,22 +155,16 @@ class Harvest(object):
         only volumes ('M').
         """
         # Compute #
-        df = (self.check
-              .set_index('dist_type_id')
-              .groupby(['dist_type_id',
-                        'dist_type_name',
-                        'time_step',
-                        'status',
-                        'forest_type',
-                        'management_type',
-                        'management_strategy'])
-              .agg({'vol_merch':           'sum',
-                    'vol_snags':           'sum',
-                    'vol_sub_merch':       'sum',
-                    'vol_forest_residues': 'sum',
-                    'prov_carbon':         'sum',
-                    'tc':                  'sum'})
-              .reset_index())
+        index = ['dist_type_id',
+                 'dist_type_name',
+                 'time_step',
+                 'status',
+                 'forest_type',
+                 'management_type',
+                 'management_strategy']
+        columns = ['vol_merch', 'vol_snags', 'vol_sub_merch',
+                   'vol_forest_residues', 'prov_carbon', 'tc']
+        df = self.rollup(index, columns)
         # Add the total volume column #
         df['tot_vol'] = df['vol_merch'] + df['vol_sub_merch'] + df['vol_snags']
         # Add the Measurement_type #
@@ -171,29 +173,36 @@ class Harvest(object):
         return df
 
     #-------------------------------------------------------------------------#
+    @property_cached
+    def dist_indicators(self):
+        """
+        Load area disturbed from the table 'TblDistIndicators' and add
+        dist_type_name and classifiers. There is exactly one row per row
+        of the database.
+        """
+        # Load #
+        dist_indicators  = self.parent.database['TblDistIndicators']
+        disturbance_type = self.parent.database['tblDisturbanceType']
+        # Join #
+        df = dist_indicators.left_join(disturbance_type, 'dist_type_id', validate='many_to_one')
+        df = self.parent.add_classifiers(df)
+        # Return #
+        return df
+
     @property_cached
     def provided_area(self):
         """
-        Load area disturbed from the table 'TblDistIndicators'
+        Area disturbed from the table 'TblDistIndicators' grouped by
+        disturbance, time step and classifiers.
 
-        Columns are:    ['DistIndID', 'SPUID', 'dist_type_id', 'time_step', 'user_defd_class_set_id',
-                         'LandClassID', 'kf2', 'kf3', 'kf4', 'kf5', 'kf6', 'dist_area',
-                         'dist_product']
+        Columns are:    ['dist_type_id', 'dist_type_name', 'time_step', 'status', 'forest_type',
+                         'region', 'management_type', 'management_strategy',
+                         'conifers_broadleaves', 'dist_area', 'dist_product',
+                         'measurement_type']
 
         This corresponds to the "provided" aspect of "expected_provided" harvest and contains
         only areas ('A').
         """
-        # Load #
-        dist_indicators  = self.parent.database['TblDistIndicators']
-        disturbance_type = self.parent.database['tblDisturbanceType']
-        # First ungrouped #
-        ungrouped = (dist_indicators
-                     .set_index('dist_type_id')
-                     .join(disturbance_type.set_index('dist_type_id'))
-                     .reset_index()
-                     .set_index('user_defd_class_set_id')
-                     .join(self.parent.classifiers.set_index('user_defd_class_set_id'))
-                     .reset_index())
         # The index we will use for grouping #
         index = ['dist_type_id',
                  'dist_type_name',
@@ -205,9 +214,8 @@ class Harvest(object):
                  'management_strategy',
                  'conifers_broadleaves']
         # Compute #
-        df = (ungrouped
-              .set_index('dist_type_id')
-              .groupby(index)
+        df = (self.dist_indicators
+              .groupby(index, observed=True)
               .agg({'dist_area':    'sum',
                     'dist_product': 'sum'})
               .reset_index())
@@ -217,55 +225,82 @@ class Harvest(object):
         return df
 
     #-------------------------------------------------------------------------#
-    def compute_expected_provided(self, provided, meas_type, prov_col_name):
+    # Columns we will keep when comparing expected and provided #
+    exp_prov_index = ['time_step',
+                      'dist_type_name',
+                      'forest_type',
+                      'measurement_type',
+                      #'region',
+                      #'management_type',
+                      #'management_strategy',
+                      #'conifers_broadleaves'
+                      #'status'
+                     ]
+
+    @property_cached
+    def expected(self):
+        """
+        The amount of harvest requested in the disturbance tables (an input
+        to the simulation) for both measurement types, mass ('M') and
+        area ('A'), aggregated on `exp_prov_index`.
+        """
+        # Load #
+        df = self.parent.disturbances
+        # Filter for measurement types #
+        df = df.loc[df['measurement_type'].isin(['M', 'A'])]
+        # Aggregate #
+        df = (df
+              .groupby(self.exp_prov_index, observed=True)
+              .agg({'amount': 'sum'})
+              .reset_index())
+        # Return #
+        return df
+
+    @property_cached
+    def provided(self):
+        """
+        The amount of harvest actually performed by the model, mass from
+        `provided_volume` and area from `provided_area`, aggregated on
+        `exp_prov_index` in a single group by.
+        """
+        # Stack the two measurement types in one column #
+        volume = self.provided_volume[self.exp_prov_index + ['prov_carbon']]
+        area   = self.provided_area[self.exp_prov_index + ['dist_area']]
+        df = pandas.concat([volume.rename(columns={'prov_carbon': 'provided'}),
+                            area.rename(columns={'dist_area': 'provided'})],
+                           ignore_index=True)
+        # Aggregate #
+        df = (df
+              .groupby(self.exp_prov_index, observed=True)
+              .agg({'provided': 'sum'})
+              .reset_index())
+        # Return #
+        return df
+
+    @property_cached
+    def expected_provided(self):
         """
         Compares the amount of harvest requested in the disturbance tables (an input to the simulation)
         to the amount of harvest actually performed by the model (extracted from the flux indicator table).
 
         Based on Roberto's query `Harvest_expected_provided` visible in the original calibration database.
 
-        In this method we transform *df*, by adding:
+        Both measurement types are handled at once. Compared to `self.expected`
+        and `self.provided` we have:
 
          - Years instead of TimeSteps
          - Rows where expected and provided are both zero removed
          - An extra column indicating the delta between expected and provided
          - An extra column indicating the disturbance description sentence.
         """
-        # Columns we will keep #
-        index = ['time_step',
-                 'dist_type_name',
-                 'forest_type',
-                 'measurement_type',
-                 #'region',
-                 #'management_type',
-                 #'management_strategy',
-                 #'conifers_broadleaves'
-                 #'status'
-                ]
-        # Load #
-        expected = self.parent.disturbances
-        # Filter for measurement type #
-        selector = expected['measurement_type'] == meas_type
-        expected = expected.loc[selector].copy()
-        # Aggregate expected #
-        expected = (expected
-                    .groupby(index)
-                    .agg({'amount': 'sum'})
-                    .reset_index())
-        # Aggregate provided #
-        provided = (provided
-                    .groupby(index)
-                    .agg({prov_col_name: 'sum'})
-                    .reset_index())
-        # Index columns to join disturbances and harvest check #
         # Set the same index on both data frames #
-        provided = provided.set_index(index)
-        expected = expected.set_index(index)
+        index    = self.exp_prov_index
+        provided = self.provided.set_index(index)
+        expected = self.expected.set_index(index)
         # Do the join #
         df = (provided.join(expected, how='outer')).reset_index()
-        # Sum two columns #
-        df = df.rename(columns = {'amount':      'expected',
-                                  prov_col_name: 'provided'})
+        # Rename #
+        df = df.rename(columns = {'amount': 'expected'})
         # Remove rows where both expected and provided are zero #
         selector = (df['expected'] == 0.0) & (df['provided'] == 0.0)
         df = df.loc[~selector].copy()
@@ -293,13 +328,11 @@ class Harvest(object):
         """
         "Measurement_type == 'M'"
 
-        Columns are: ['status', 'time_step', 'dist_type_name', 'forest_type', 'management_type',
-                      'management_strategy', 'expected', 'provided', 'measurement_type',
-                      'dist_desc_input']
+        Columns are: ['dist_type_name', 'forest_type', 'measurement_type', 'provided',
+                      'expected', 'delta', 'year', 'dist_desc_input']
         """
-        # Compute #
-        df = self.provided_volume
-        return self.compute_expected_provided(df, 'M', 'prov_carbon')
+        df = self.expected_provided
+        return df.loc[df['measurement_type'] == 'M'].copy()
 
     #-------------------------------------------------------------------------#
     @property_cached
@@ -307,13 +340,11 @@ class Harvest(object):
         """
         Same as above but for "Measurement_type == 'A'"
 
-        Columns are: ['status', 'time_step', 'dist_type_name', 'forest_type', 'management_type',
-                      'management_strategy', 'expected', 'provided', 'measurement_type',
-                      'dist_desc_input']
+        Columns are: ['dist_type_name', 'forest_type', 'measurement_type', 'provided',
+                      'expected', 'delta', 'year', 'dist_desc_input']
         """
-        # Compute #
-        df = self.provided_area
-        return self.compute_expected_provided(df, 'A', 'dist_area')
+        df = self.expected_provided
+        return df.loc[df['measurement_type'] == 'A'].copy()
 
     #-------------------------------------------------------------------------#
     def check_exp_prov(self):
@@ -325,12 +356,12 @@ class Harvest(object):
         processed = volu['expected'].sum() + area['expected'].sum()
         raw       = self.parent.parent.input_data.disturbance_events['amount'].sum()
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
-        # Check provided area #
+        # Check provided area against the ungrouped dist indicators #
         processed = area['provided'].sum()
-        raw       = self.parent.database['TblDistIndicators']['dist_area'].sum()
+        raw       = self.dist_indicators['dist_area'].sum()
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
-        # Check provided volume #
+        # Check provided volume against the harvest cube #
+        # (itself checked against the flux indicators when built)
         processed = volu['provided'].sum()
-        raw       = self.parent.database['TblFluxIndicators']
-        raw       = raw['soft_production'].sum() + raw['hard_production'].sum() + raw['dom_production'].sum()
+        raw       = self.cube['prov_carbon'].sum()
         numpy.testing.assert_allclose(processed, raw, rtol=1e-03)
\ No newline at end of file
@@ -14,7 +14,7 @@ Unit D1 Bioeconomy.
 import pandas, numpy
 
 # Internal modules #
-from .bin_discretizer import aggregator, binner
+from .bin_discretizer import aggregator, grouped_binner, redistribute
 
 # First party modules #
 from plumbing.cache import property_cached
@@ -45,11 +45,8 @@ class Inventory(object):
         """CBM output table containing the forest area by age class"""
         # Load table #
         age_indicators = self.parent.database["tblAgeIndicators"]
-        classifr_coefs = self.parent.classifiers_coefs
-        # Join
-        df = (age_indicators
-              .left_join(classifr_coefs, on='user_defd_class_set_id')
-              )
+        # Join with the classifiers and coefficients #
+        df = self.parent.add_classifiers(age_indicators, coefs=True)
         return df
 
     #-------------------------------------------------------------------------#
@@ -60,21 +57,14 @@ class Inventory(object):
         This is translated from an SQL query authored by RP.
         It calculates merchantable biomass.
         """
-        # Join #
-        df = self.parent.pool_indicators
-        # Sum for everyone #
-        cols_sum = {'sw_merch'  : 'sum',
-                    'sw_foliage': 'sum',
-                    'sw_other'  : 'sum',
-                    'hw_merch'  : 'sum',
-                    'hw_foliage': 'sum',
-                    'hw_other'  : 'sum',
-                    'sw_coarse' : 'sum',
-                    'sw_fine'   : 'sum',
-                    'hw_coarse' : 'sum',
-                    'hw_fine'   : 'sum'}
-        # Group and aggregate #
-        df = df.groupby("forest_type").agg(cols_sum).reset_index()
+        # Columns to sum for everyone #
+        cols_sum = ['sw_merch', 'sw_foliage', 'sw_other',
+                    'hw_merch', 'hw_foliage', 'hw_other',
+                    'sw_coarse', 'sw_fine', 'hw_coarse', 'hw_fine']
+        # Aggregate over all time steps from the on-disk arrays #
+        df = self.parent.pool_arrays.aggregate('pools', cols_sum,
+                                               by           = ['forest_type'],
+                                               by_time_step = False)
         # Make new columns #
         df['tot_merch']  = df.sw_merch   + df.hw_merch
         df['tot_abg']    = df.sw_merch   + df.hw_merch   + \
@@ -117,6 +107,8 @@ class Inventory(object):
     group_cols = ['time_step', 'forest_type']
     # Column we will keep and sum on #
     sum_col = 'area'
+    # Columns we will average in every bin, weighted by the sum column #
+    mean_cols = ['biomass', 'merch_vol_ha']
     # Column we will use for the summing, this will never change #
     bin_col = 'ave_age'
     # The bin width we will use when recreating bins #
@@ -144,7 +136,7 @@ class Inventory(object):
             ...         ...        ... ...
         """
         # Group #
-        grouped = self.simulated.groupby(self.group_cols)
+        grouped = self.simulated.groupby(self.group_cols, observed=True)
         # Iterate #
         result = []
         for col_values, df in grouped:
@@ -162,7 +154,9 @@ class Inventory(object):
     #-------------------------------------------------------------------------#
     @property_cached
     def grouped_bins(self):
-        """Using the vectorized version, recreate bins and average values.
+        """Recreate bins of `bin_width` years and sum values in each of them.
+        Every row of the simulated inventory is spread uniformly over its
+        age class and the overlap with each new bin is computed exactly.
 
          The data frame will look like this:
 
@@ -177,27 +171,38 @@ class Inventory(object):
                          FS                40.0     60.0   979.168979
                 ...     ...                 ...      ...          ...
         """
+        return self.grouped_bins_all[['age_start', 'age_end', self.sum_col]]
+
+    @property_cached
+    def grouped_bins_all(self):
+        """Same as `grouped_bins` but with the columns in `mean_cols` too,
+        computed in the same pass. The data frame will look like this:
+
+                                  age_start  age_end         area  biomass  merch_vol_ha
+            time_step forest_type
+            0         DF                0.0     20.0   792.530945    12.31         25.12
+                      DF               20.0     40.0   663.677941    54.90        112.03
+            ...       ...               ...      ...          ...      ...           ...
+        """
+        return redistribute(self.simulated, self.group_cols, self.sum_col,
+                            self.bin_col, self.bin_width,
+                            mean_cols  = self.mean_cols,
+                            weight_col = self.sum_col)
+
+    @property_cached
+    def grouped_bins_discrete(self):
+        """Same as `grouped_bins` but going through the vectorized version
+        with a discrete precision of CBM_PRECISION years."""
         # Load the vector version #
         df = self.grouped_vectors
-        # Empty data frame to contain result #
-        result  = pandas.DataFrame()
-        # Iterate #
-        for i, row in df.iterrows():
-            # Compute a data frame containing the recreated bins #
-            current = binner(row[self.sum_col], self.sum_col, self.bin_width)
-            # Keep the current values of the group columns as an index #
-            col_values = [row[col] for col in self.group_cols]
-            current = current.assign(**dict(zip(self.group_cols, col_values)))
-            current = current.set_index(self.group_cols)
-            # Append #
-            result = result.append(current)
-        # Return #
-        return result
+        # Rebin all groups at once #
+        return grouped_binner(df, self.group_cols, self.sum_col, self.bin_width)
 
     #-------------------------------------------------------------------------#
     def check_conservation(self):
         """Assert that total area of forest is conserved after
-        successive steps of discretization and rebinning."""
+        rebinning. The comparison with the discretized version is in
+        scripts/benchmarks/bench_redistribute.py."""
         # Compute #
         df1 = self.simulated
         df2 = self.grouped_bins
@@ -242,14 +247,11 @@ class Inventory(object):
         """
         # Load data #
         df    = self.parent.database['tblPoolIndicators']
-        clifr = self.parent.classifiers.set_index("user_defd_class_set_id")
         # Our index #
         index = ['time_step', 'forest_type', 'conifers_broadleaves']
         # Join #
-        df = (df
-              .set_index('user_defd_class_set_id')
-              .join(clifr)
-              .groupby(index)
+        df = (self.parent.add_classifiers(df)
+              .groupby(index, observed=True)
               .agg({'hw_merch': 'sum',
                     'sw_merch': 'sum'})
               .reset_index())
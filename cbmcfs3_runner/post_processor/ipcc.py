@@ -11,7 +11,7 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import pandas
+import numpy, pandas
 
 # First party modules #
 from plumbing.cache import property_cached
@@ -71,32 +71,60 @@ class Ipcc(object):
         # Return #
         return df
 
+    @property_cached
+    def pool_matrix(self):
+        """
+        A matrix of zeros and ones with the CBM pools of the pool
+        indicators table in rows and the IPCC pools in columns. CBM pools
+        missing from the mapping go to the 'not_available' column.
+        Multiplying the pool indicators by this matrix gives IPCC pools.
+        """
+        # Every CBM pool with its IPCC pool #
+        pools = self.parent.pool_names
+        df = pandas.DataFrame({'pool': pools})
+        df = df.left_join(self.ipcc_pool_mapping[['pool', 'ipcc_pool']], 'pool')
+        # Explicitly name NA values #
+        df['ipcc_pool'] = df['ipcc_pool'].fillna('not_available')
+        # Count the links, the columns come out sorted #
+        df = pandas.crosstab(df['pool'], df['ipcc_pool']).reindex(pools)
+        # Return #
+        return df
+
     @property_cached
     def pool_indicators_long(self):
         """
         Aggregate the pool indicators table along the 5 IPCC pools
         Keep the details of each stand separate
         i.e. each possible combination of classifiers remains in the data.
+
+        The IPCC pools are computed with a single matrix product of the
+        wide pool indicators and `self.pool_matrix`, only the aggregated
+        result is put in long format.
         """
         # Load the one from the post processor #
-        df = self.parent.pool_indicators_long
-        # Add the 5 IPCC pools to the table #
-        df = df.left_join(self.ipcc_pool_mapping, on=['pool'])
-        # Explicitly name NA values before grouping #
-        df['ipcc_pool'] = df['ipcc_pool'].fillna('not_available')
-        # Aggregate total carbon weight along the 5 IPCC pools #
-        # Change ipcc_pool column to a factor variable
-        df['ipcc_pool'] = df['ipcc_pool'].astype('category')
-        index = self.parent.classifiers_names
-        index = index + ['ipcc_pool', 'time_step', 'year']
-        # Group by and aggregate #
-        df = (df
+        df     = self.parent.pool_indicators
+        matrix = self.pool_matrix
+        # Sum the CBM pools in each IPCC pool, missing values count as zero #
+        values = numpy.nan_to_num(df[list(matrix.index)].to_numpy(dtype='float64'))
+        values = pandas.DataFrame(values @ matrix.to_numpy(dtype='float64'),
+                                  columns=list(matrix.columns), index=df.index)
+        # Aggregate total carbon weight by classifiers and time step #
+        index = self.parent.classifiers_names + ['time_step']
+        df = (pandas.concat([df[index], values], axis=1)
               .groupby(index, observed=True)
-              .agg({'tc':sum})
-              .reset_index()
-              )
+              .sum()
+              .reset_index())
+        # Reshape the aggregated table to long format #
+        df = df.melt(id_vars=index, var_name='ipcc_pool', value_name='tc')
+        # Change ipcc_pool column to a factor variable #
+        df['ipcc_pool'] = df['ipcc_pool'].astype('category')
+        # Same order as a group by on the classifiers, pool and time step #
+        classifiers = self.parent.classifiers_names
+        df = df.sort_values(classifiers + ['ipcc_pool', 'time_step'])
+        # Add year #
+        df['year'] = self.country.timestep_to_year(df['time_step'])
         # Return #
-        return df
+        return df[classifiers + ['ipcc_pool', 'time_step', 'year', 'tc']].reset_index(drop=True)
 
     @property_cached
     def carbon_stock_long(self):
@@ -128,7 +156,7 @@ class Ipcc(object):
         # Aggregate over pools and time #
         index = ['ipcc_pool', 'time_step', 'year']
         df = (df
-              .groupby(index)
+              .groupby(index, observed=True)
               .agg({'tc':sum})
               .reset_index()
               )
@@ -147,8 +175,8 @@ class Ipcc(object):
         # and Carbon stock change per hectare
         index = ['ipcc_pool']
         df = df.sort_values(by = index + ['year'])
-        df['tc_change'] = df.groupby(index)['tc'].diff()
-        df['tc_change_ha'] = df.groupby(index)['tc_ha'].diff()
+        df['tc_change'] = df.groupby(index, observed=True)['tc'].diff()
+        df['tc_change_ha'] = df.groupby(index, observed=True)['tc_ha'].diff()
         # Add CO2 emissions per hectare #
         df['co2_em_ha'] = - df['tc_change_ha'] * 44/12
         # Add iso3 code #
@@ -162,7 +190,7 @@ class Ipcc(object):
         df = self.carbon_stock_change
         index = ['time_step', 'year']
         df = (df
-              .groupby(index)
+              .groupby(index, observed=True)
               # Is it useful to compute the C02 emissions here ?
               )
         df['co2_stock'] = - df['tc'] * 44/12
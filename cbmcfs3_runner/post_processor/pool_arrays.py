@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+You can use this object like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> runner = continent[('static_demand', 'FR', -1)]
+    >>> arrays = runner.post_processor.pool_arrays
+    >>> arrays.aggregate('pools', ['sw_merch', 'hw_merch'], by=['forest_type'])
+"""
+
+# Built-in modules #
+import os, json, subprocess
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+from plumbing.cache import property_cached
+from plumbing.common import camel_to_snake
+from autopaths.auto_paths import AutoPaths
+
+# Internal modules #
+
+###############################################################################
+class PoolArrays(object):
+    """
+    A compact on-disk copy of the big output tables of CBM.
+
+    Every value column of a table, for instance 'sw_merch' in
+    'tblPoolIndicators', is stored as a memory-mapped numpy array with one
+    row per classifier set and one column per time step. Rows sharing the
+    same coordinates (e.g. different spatial units) are summed.
+
+    The classifiers of each row are stored once, as an integer code table
+    with one column per classifier. Aggregations then only need to read
+    the arrays block by block and never build the large joined and melted
+    data frames in memory.
+
+    The arrays are built the first time they are needed, and rebuilt when
+    the database is more recent. The table is read in chunks of
+    `chunk_size` rows, with ODBC on Windows and with mdbtools on Linux,
+    so that it is never loaded in memory as a whole.
+    """
+
+    all_paths = """
+    /output/arrays/
+    """
+
+    # The tables we can convert and the dimensions of their arrays #
+    tables = {
+        'pools':  ('tblPoolIndicators', ['user_defd_class_set_id', 'time_step']),
+    }
+
+    # Identifier columns that are neither dimensions nor values #
+    ignored = ['pool_ind_id', 'spuid', 'land_class_id']
+
+    # Precision of the arrays, float32 would halve the disk usage #
+    dtype = 'float64'
+
+    # Number of classifier sets summed at once when aggregating #
+    block_size = 4096
+
+    # Number of rows of the database table read at once when building #
+    chunk_size = 200000
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.paths.arrays_dir)
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        # Directories #
+        self.paths = AutoPaths(self.parent.parent.data_dir, self.all_paths)
+
+    def __getitem__(self, name):
+        """The metadata of one table, building the arrays if needed."""
+        if not self.is_up_to_date(name): self.build(name)
+        with open(self.meta_path(name)) as handle: return json.load(handle)
+
+    #-------------------------------------------------------------------------#
+    def meta_path(self, name):
+        """The JSON file describing the arrays of one table."""
+        return str(self.paths.arrays_dir) + name + '.json'
+
+    def array_path(self, name, column):
+        """The numpy file containing one value column of one table."""
+        return str(self.paths.arrays_dir) + name + '_' + column + '.npy'
+
+    def is_up_to_date(self, name):
+        """The arrays exist and are more recent than the database."""
+        meta = self.meta_path(name)
+        if not os.path.exists(meta): return False
+        return os.path.getmtime(meta) >= os.path.getmtime(str(self.parent.paths.mdb))
+
+    def array(self, name, column):
+        """Open one value column as a read-only memory map."""
+        return numpy.load(self.array_path(name, column), mmap_mode='r')
+
+    #-------------------------------------------------------------------------#
+    def read_chunks(self, table):
+        """
+        Iterate over a table of the database as data frames of at most
+        `chunk_size` rows, with the same column names as when the
+        table is read through the database object.
+        """
+        database = self.parent.database
+        database.table_must_exist(table)
+        # If we are on unix use mdb-tools #
+        if os.name == "posix":
+            cmd    = ['mdb-export', str(database.path), table]
+            proc   = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+            chunks = pandas.read_csv(proc.stdout, chunksize=self.chunk_size)
+        # Default case #
+        else:
+            query  = "SELECT * FROM `%s`" % table.lower()
+            chunks = pandas.read_sql(query, database.own_conn, chunksize=self.chunk_size)
+        # Rename the columns like the database object does #
+        for df in chunks:
+            if database.convert_col_names_to_snake: df = df.rename(columns=camel_to_snake)
+            yield df
+
+    def build(self, name):
+        """
+        Read a table of the database and accumulate its values in
+        memory-mapped arrays. The metadata file is written last so that
+        an interrupted build is never used.
+
+        The table is read twice, chunk by chunk: a first time to find the
+        distinct values along each dimension, which give the shape of the
+        arrays, and a second time to sum the values in the arrays.
+        """
+        # The table and its dimensions #
+        table, dims = self.tables[name]
+        # First pass: the sorted distinct values along each dimension #
+        levels = [numpy.array([], dtype='int64') for dim in dims]
+        values = None
+        for df in self.read_chunks(table):
+            if values is None:
+                values = [c for c in df.columns if c not in dims and c not in self.ignored]
+            levels = [numpy.union1d(level, df[dim].values)
+                      for level, dim in zip(levels, dims)]
+        shape = tuple(len(level) for level in levels)
+        # Create the arrays on disk #
+        for col in values:
+            array = numpy.lib.format.open_memmap(self.array_path(name, col),
+                                                 mode='w+', dtype=self.dtype, shape=shape)
+            del array
+        # Second pass: sum the values in the arrays #
+        arrays = {col: numpy.load(self.array_path(name, col), mmap_mode='r+')
+                  for col in values}
+        for df in self.read_chunks(table):
+            coords = tuple(numpy.searchsorted(level, df[dim].values)
+                           for level, dim in zip(levels, dims))
+            for col in values:
+                numpy.add.at(arrays[col], coords,
+                             numpy.nan_to_num(df[col].values.astype('float64')))
+        for array in arrays.values(): array.flush()
+        del arrays
+        # Write the metadata #
+        meta = {'table':  table,
+                'dims':   dims,
+                'levels': [level.tolist() for level in levels],
+                'values': values}
+        with open(self.meta_path(name), 'w') as handle: json.dump(meta, handle)
+
+    #-------------------------------------------------------------------------#
+    @property_cached
+    def classifier_codes(self):
+        """
+        The classifiers of every classifier set as a data frame of integer
+        codes (-1 for missing values) indexed on 'user_defd_class_set_id'.
+        The corresponding labels are in `self.classifier_labels`.
+        """
+        df = self.parent.classifiers.set_index('user_defd_class_set_id')
+        return df.astype('category').apply(lambda s: s.cat.codes).astype('int32')
+
+    @property_cached
+    def classifier_labels(self):
+        """The labels of the integer codes, for each classifier."""
+        df = self.parent.classifiers.set_index('user_defd_class_set_id')
+        return {col: df[col].astype('category').cat.categories for col in df.columns}
+
+    def codes(self, name, by):
+        """The classifier codes aligned on the rows of the arrays of a table."""
+        class_sets = self[name]['levels'][0]
+        return self.classifier_codes.reindex(class_sets).fillna(-1).astype('int32')[by].values
+
+    #-------------------------------------------------------------------------#
+    def aggregate(self, name, columns, by=None, by_time_step=True):
+        """
+        Sum the given value columns of a table over all classifier sets
+        that share the same values for the classifiers in `by`.
+        Classifier sets with missing values in `by` are dropped.
+
+        Returns a data frame with the columns `by`, 'time_step' (unless
+        `by_time_step` is False) and the aggregated `columns`.
+        """
+        # Default value #
+        if by is None: by = []
+        meta = self[name]
+        # Group the classifier sets #
+        codes = self.codes(name, by)
+        keep  = (codes >= 0).all(axis=1)
+        if by: uniques, groups = numpy.unique(codes, axis=0, return_inverse=True)
+        else:  uniques, groups = codes[:1], numpy.zeros(len(codes), dtype=int)
+        groups = groups.ravel()
+        # Sum each column one block of rows at a time #
+        time_steps = numpy.array(meta['levels'][1])
+        result = {}
+        for col in columns:
+            array = self.array(name, col)
+            total = numpy.zeros((len(uniques), len(time_steps)))
+            for start in range(0, array.shape[0], self.block_size):
+                stop  = start + self.block_size
+                block = numpy.asarray(array[start:stop], dtype='float64')
+                block = block[keep[start:stop]]
+                numpy.add.at(total, groups[start:stop][keep[start:stop]], block)
+            result[col] = total
+        # Keep only the groups that were observed without missing values #
+        observed = (uniques >= 0).all(axis=1)
+        uniques  = uniques[observed]
+        # Build the data frame #
+        if by_time_step:
+            df = pandas.DataFrame({c: numpy.repeat(self.classifier_labels[c][uniques[:, i]],
+                                                   len(time_steps))
+                                   for i, c in enumerate(by)})
+            df['time_step'] = numpy.tile(time_steps, len(uniques))
+            for col in columns: df[col] = result[col][observed].ravel()
+        else:
+            df = pandas.DataFrame({c: self.classifier_labels[c][uniques[:, i]]
+                                   for i, c in enumerate(by)})
+            for col in columns: df[col] = result[col][observed].sum(axis=1)
+        # Return #
+        return df
@@ -11,7 +11,7 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
-import numpy
+import numpy, pandas
 import re
 
 # First party modules #
@@ -46,7 +46,7 @@ class Products(object):
     @property_cached
     def hwp_intermediate(self):
         """
-        Intermediate table based on `post_processor.harvest.check`.
+        Intermediate table based on the harvest cube `post_processor.harvest.cube`.
         Joins disturbance id from the silviculture table.
         to allocate specific disturbances to specific wood products.
         TODO: make this work for historical disturbances as well.
@@ -60,12 +60,13 @@ class Products(object):
                       'forest_type',
                       'management_type',
                       'management_strategy']
+        columns    = ['vol_merch', 'vol_sub_merch', 'vol_snags', 'tc']
         # Take only a few columns #
         silv = self.silviculture[join_index + ['hwp']]
         silv = silv.set_index(join_index)
-        # Join #
-        df = (self.parent.harvest.check
-              .reset_index()
+        # Roll up the harvest cube to the join index first, then join #
+        df = (self.parent.harvest
+              .rollup(['time_step'] + join_index, columns)
               .set_index(join_index)
               .join(silv))
         # 'hwp' rows with NaNs will be thrown away by the aggregation below
@@ -73,115 +74,53 @@ class Products(object):
         # i.e. to force all rows to have a value,
         # we would do: assert not df[join_index].isna().any().any()
         # Group #
-        df = (df.groupby(['time_step', 'hwp'])
-                .agg({'vol_merch':     'sum',
-                      'vol_sub_merch': 'sum',
-                      'vol_snags':     'sum',
-                      'tc':            'sum'})
+        df = (df.groupby(['time_step', 'hwp'], observed=True)
+                .agg(dict.fromkeys(columns, 'sum'))
                 .reset_index())
         # Return #
         return df
 
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def irw_b(self):
-        """Harvest volumes of Industrial Round Wood Broadleaves."""
-        df = (self.hwp_intermediate
-              .query('hwp == "irw_b"')
-              .rename(columns={'vol_merch':     'vol_merch_irw_b',
-                               'vol_sub_merch': 'vol_sub_merch_irw_b',
-                               'vol_snags':     'vol_snags_irw_b',
-                               'tc':            'tc_irw_b'}))
-        # Drop HWP column
-        # because it doesn't make sense anymore below when we join different products together
-        df = df.drop('hwp', axis = 1)
-        # Return #
-        return df
-
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def irw_c(self):
-        """Harvest volumes of Industrial Round Wood Coniferous."""
-        df = (self.hwp_intermediate
-              .query('hwp == "irw_c"')
-              .rename(columns={'vol_merch':     'vol_merch_irw_c',
-                               'vol_sub_merch': 'vol_sub_merch_irw_c',
-                               'vol_snags':     'vol_snags_irw_c',
-                               'tc':            'tc_irw_c'}))
-        df = df.drop('hwp', axis = 1)
-        # Return #
-        return df
-
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def fw_b(self):
-        """Harvest volumes of Fuel Wood Broadleaves."""
-        df = (self.hwp_intermediate
-              .query('hwp == "fw_b"')
-              .rename(columns={'vol_merch':     'vol_merch_fw_b',
-                               'vol_sub_merch': 'vol_sub_merch_fw_b',
-                               'vol_snags':     'vol_snags_fw_b',
-                               'tc':            'tc_fw_b'}))
-        # Return #
-        return df
+    # The harvested wood products and the values we have for each #
+    hwp_names  = ['irw_b', 'irw_c', 'fw_b', 'fw_c']
+    hwp_values = ['vol_merch', 'vol_sub_merch', 'vol_snags', 'tc']
 
     #-------------------------------------------------------------------------#
     @property_cached
-    def fw_b_total(self):
+    def wide(self):
         """
-        Harvest volumes of Fuel Wood Broadleaves
-        Join Industrial Round Wood co-products: 'vol_sub_merch_irw_b' and 'vol_snags_irw_b'
-        into the fuel wood total.
+        Harvest volumes of every product, with one row per time step.
+        The `hwp_intermediate` table is pivoted so that the columns are
+        named like 'vol_merch_irw_b' or 'tc_fw_c'. Values are missing
+        where a product wasn't harvested at a given time step.
+
+        The fuel wood totals 'tot_vol_fw_b' and 'tot_vol_fw_c' include the
+        co-products of Industrial Round Wood: 'vol_sub_merch_irw_b' and
+        'vol_snags_irw_b' (respectively '_irw_c').
         """
-        df = self.irw_b.outer_join(self.fw_b, 'time_step')
-        df['tot_vol_fw_b'] = sum([df['vol_merch_fw_b'],
-                                  df['vol_sub_merch_fw_b'],
-                                  df['vol_snags_fw_b'],
-                                  df['vol_sub_merch_irw_b'],
-                                  df['vol_snags_irw_b']])
-        df = df[['time_step',
-                 'vol_merch_fw_b', 'vol_sub_merch_fw_b', 'vol_snags_fw_b',
-                 'vol_sub_merch_irw_b', 'vol_snags_irw_b',
-                 'tot_vol_fw_b']]
-        # Return #
-        return df
-
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def fw_c(self):
-        """Harvest volumes of Fuel Wood Coniferous."""
-        df = (self.hwp_intermediate
-              .query('hwp == "fw_c"')
-              .rename(columns={'vol_merch':     'vol_merch_fw_c',
-                               'vol_sub_merch': 'vol_sub_merch_fw_c',
-                               'vol_snags':     'vol_snags_fw_c',
-                               'tc':            'tc_fw_c'}))
-        # Return #
-        return df
-
-    #-------------------------------------------------------------------------#
-    @property_cached
-    def fw_c_total(self):
-        """
-        Harvest volumes of Fuel Wood Coniferous
-        Join Industrial Round Wood co-products.
-        """
-        df = self.irw_c.outer_join(self.fw_c, 'time_step')
+        # Pivot #
+        df = self.hwp_intermediate.pivot(index='time_step', columns='hwp', values=self.hwp_values)
+        # Make sure every product is present, even if it wasn't harvested #
+        all_columns = pandas.MultiIndex.from_product([self.hwp_values, self.hwp_names])
+        df = df.reindex(columns=all_columns)
+        df.columns = [value + '_' + hwp for value, hwp in df.columns]
+        # Fuel wood broadleaves with the co-products #
+        df['tot_vol_fw_b'] = (df['vol_merch_fw_b']
+                              + df['vol_sub_merch_fw_b']
+                              + df['vol_snags_fw_b']
+                              + df['vol_sub_merch_irw_b']
+                              + df['vol_snags_irw_b'])
+        # Fuel wood coniferous with the co-products #
+        # If there was no fuel wood harvest, only the co-products count
         df['tot_vol_fw_c'] = numpy.where(df['vol_merch_fw_c'] >= 0,
-                                         sum([df['vol_merch_fw_c'],
-                                              df['vol_sub_merch_fw_c'],
-                                              df['vol_snags_fw_c'],
-                                              df['vol_sub_merch_irw_c'],
-                                              df['vol_snags_irw_c']]),
-                                         sum([df['vol_sub_merch_irw_c'],
-                                              df['vol_snags_irw_c']]))
-        # Select columns of interest #
-        df = df[['time_step',
-                 'vol_merch_fw_c','vol_sub_merch_fw_c','vol_snags_fw_c',
-                 'vol_sub_merch_irw_c','vol_snags_irw_c',
-                 'tot_vol_fw_c']]
+                                         df['vol_merch_fw_c']
+                                         + df['vol_sub_merch_fw_c']
+                                         + df['vol_snags_fw_c']
+                                         + df['vol_sub_merch_irw_c']
+                                         + df['vol_snags_irw_c'],
+                                         df['vol_sub_merch_irw_c']
+                                         + df['vol_snags_irw_c'])
         # Return #
-        return df
+        return df.reset_index()
 
     #-------------------------------------------------------------------------#
     @property_cached
@@ -191,16 +130,15 @@ class Products(object):
         Matching the product description available in the economic model
         and in the FAOSTAT historical data.
 
-        Join "vol_merch" columns from "irw_b" and "irw_c"
-        to the total columns from "fw_b_total" and "fw_c_total",
-        using the time step as an index.
+        Take "vol_merch" columns of "irw_b" and "irw_c" and the fuel wood
+        totals from the `wide` table, for the time steps where there was
+        a harvest of "irw_c".
         """
-        df = (self.irw_c
-              .set_index('time_step')[['vol_merch_irw_c']]
-              .join(self.irw_b.set_index('time_step')[['vol_merch_irw_b']])
-              .join(self.fw_c_total.set_index('time_step')[['tot_vol_fw_c']])
-              .join(self.fw_b_total.set_index('time_step')[['tot_vol_fw_b']])
-              .reset_index())
+        # Columns of interest #
+        columns = ['time_step', 'vol_merch_irw_c', 'vol_merch_irw_b',
+                   'tot_vol_fw_c', 'tot_vol_fw_b']
+        df = self.wide
+        df = df.loc[df['vol_merch_irw_c'].notna(), columns].reset_index(drop=True)
         # Add year #
         df['year'] = self.parent.parent.country.timestep_to_year(df['time_step'])
         # Rename columns to standard IRW and FW product names
@@ -11,6 +11,7 @@ Unit D1 Bioeconomy.
 # Built-in modules #
 
 # Third party modules #
+import pandas
 
 # First party modules #
 from autopaths.auto_paths import AutoPaths
@@ -35,6 +36,7 @@ class PreProcessor(object):
     /input/csv/transition_rules.csv
     /input/csv/yields.csv
     /input/csv/historical_yields.csv
+    /input/parquet/
     """
 
     # Default case #
@@ -59,6 +61,21 @@ class PreProcessor(object):
         # Generate disturbances (dynamic function) and write those #
         df = self.disturbance_events()
         df.to_csv(str(self.paths.events), index=False)
+        # Keep a typed columnar copy of every table we just wrote #
+        self.write_columnar()
+
+    def write_columnar(self):
+        """
+        Write a parquet copy of every input CSV in the parquet directory.
+        These files contain exactly the same tables as the CSVs (which
+        are bundled into the Excel files for SIT) but keep their dtypes
+        and can be read back much faster than by parsing the Excel files.
+        See `InputData` which uses them.
+        """
+        for file in self.unchanged + ['events']:
+            csv  = self.paths[file]
+            dest = self.paths.parquet_dir + csv.prefix + '.parquet'
+            pandas.read_csv(str(csv)).to_parquet(str(dest), index=False)
 
     #--------------------------- Different events ----------------------------#
     def events_hist(self):
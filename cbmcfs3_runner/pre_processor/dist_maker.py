@@ -111,12 +111,12 @@ class DisturbanceMaker(object):
         # In case there is no silviculture.treatments for fuel wood
         index = ['step', 'conifers_broadleaves']
         dist_irw_fw = (dist_irw
-                       .groupby(index)
+                       .groupby(index, observed=True)
                        .agg({'owc_amount_from_irw':sum,
                              'snag_amount_from_irw':sum})
                        .reset_index())
         # Rename con, broad to hwp column containing fw_c, fw_b, used later as a join index
-        dist_irw_fw['hwp'] = dist_irw_fw['conifers_broadleaves'].replace(['Con', 'Broad'], ['fw_c', 'fw_b'])
+        dist_irw_fw['hwp'] = dist_irw_fw['conifers_broadleaves'].astype(str).replace(['Con', 'Broad'], ['fw_c', 'fw_b'])
         dist_irw_fw = dist_irw_fw.drop(columns='conifers_broadleaves')
 
         # Join aggregated outcome of the IRW harvest
@@ -135,8 +135,8 @@ class DisturbanceMaker(object):
         # Deduce the amount of owc and snag already generated by the IRW disturbances
         df['amount_m3_minus_irw'] = df['value_ob'] - df['owc_amount_from_irw'] - df['snag_amount_from_irw']
 
-        # If amount_m3_minus_irw is negative change it to zero
-        df['amount_m3_minus_irw'] = [a if a > 0 else 0 for a in df['amount_m3_minus_irw']]
+        # If amount_m3_minus_irw is negative (or missing) change it to zero
+        df['amount_m3_minus_irw'] = df['amount_m3_minus_irw'].where(df['amount_m3_minus_irw'] > 0, 0)
 
         # Calculate the disturbance amount based on the proportion
         # Deducing the amount of owc and snag generated by the FW disturbances
@@ -159,11 +159,11 @@ class DisturbanceMaker(object):
         df = self.dist_irw
         # Group #
         index = ['step', 'conifers_broadleaves']
-        df = (df.groupby(index)
+        df = (df.groupby(index, observed=True)
                 .agg({'amount_m3': sum})
                 .reset_index())
         # Add products column #
-        df['hwp'] = (df['conifers_broadleaves'].replace(['Con', 'Broad'], ['irw_c', 'irw_b']))
+        df['hwp'] = (df['conifers_broadleaves'].astype(str).replace(['Con', 'Broad'], ['irw_c', 'irw_b']))
         # outer join to capture all demand values,
         # even if step or con_broad is not present in dist anymore
         df = df.outer_join(self.gftm_irw_proxy, ['step', 'hwp'])
@@ -199,14 +199,16 @@ class DisturbanceMaker(object):
         irw_agg = self.dist_irw
 
         # Assemble the fuel wood amount generated by the IRW disturbances #
+        # Use `assign` so that the cached `dist_irw` is left untouched
         columns_of_interest = ['step', 'conifers_broadleaves', 'amount_m3']
-        irw_agg['amount_m3'] = (irw_agg['owc_amount_from_irw']
-                                + irw_agg['snag_amount_from_irw'])
+        irw_agg = irw_agg.assign(amount_m3 = irw_agg['owc_amount_from_irw']
+                                           + irw_agg['snag_amount_from_irw'])
         irw_agg = irw_agg[columns_of_interest]
 
         # Assemble the fuel wood amount generated by the fuel wood disturbances #
+        # Same here, the cached `dist_fw` must keep its own amounts
         df = self.dist_fw
-        df['amount_m3'] = (df['amount_m3'] * (1 + df['snag_perc'] + df['owc_perc']))
+        df = df.assign(amount_m3 = df['amount_m3'] * (1 + df['snag_perc'] + df['owc_perc']))
         df = df[columns_of_interest]
 
         # Concatenate the fuel wood and irw tables #
@@ -214,12 +216,12 @@ class DisturbanceMaker(object):
 
         # Aggregate based on the step and con broad classifier #
         index = ['step', 'conifers_broadleaves']
-        df = (df.groupby(index)
+        df = (df.groupby(index, observed=True)
                 .agg({'amount_m3':sum})
                 .reset_index())
 
         # Add products column #
-        df['hwp'] = df['conifers_broadleaves'].replace(['Con', 'Broad'], ['fw_c', 'fw_b'])
+        df['hwp'] = df['conifers_broadleaves'].astype(str).replace(['Con', 'Broad'], ['fw_c', 'fw_b'])
 
         # Outer join to capture all demand values,
         # even if step or con_broad is not present in dist anymore
@@ -253,18 +255,21 @@ class DisturbanceMaker(object):
         'max_tot_merch_hard_stem_snag_c'
     ]
 
-    def add_constants(self, df):
-        """Add constant values expected by CBM_CFS3
+    @property
+    def constants(self):
+        """Constant values expected by CBM_CFS3, by column name.
         See file "silviculture.sas" """
-        # Copy #
-        df = df.copy()
         # Special cases #
-        df['using_id']          = False
-        df['measurement_type']  = 'M'
-        # Set a lot of them to one #
-        for col in self.cols_always_minus_one: df[col] = -1
+        result = {'using_id':         False,
+                  'measurement_type': 'M'}
+        # Set a lot of them to minus one #
+        result.update(dict.fromkeys(self.cols_always_minus_one, -1))
         # Return #
-        return df
+        return result
+
+    def add_constants(self, df):
+        """Add constant values expected by CBM_CFS3 in a single copy."""
+        return df.assign(**self.constants)
 
     @property
     def demand_to_dist(self):
@@ -398,15 +403,15 @@ class DisturbanceMaker(object):
         self.check_dist_fw()
 
         # Allocation:
-        # Concatenate IRW and FW disturbance tables
+        # Stack the IRW and FW disturbance tables
         # Keep only the columns of interest for disturbances
         silv_classif = ['status', 'forest_type', 'management_type', 'management_strategy',
                         'conifers_broadleaves']
         columns_of_interest = ['dist_type_name', 'sort_type', 'efficiency', 'min_age',
                                'max_age', 'min_since_last', 'max_since_last', 'regen_delay',
                                'reset_age', 'man_nat', 'amount_m3', 'step', 'density']
-        df = pandas.concat([self.dist_irw[silv_classif + columns_of_interest],
-                            self.dist_fw[ silv_classif + columns_of_interest]])
+        source = pandas.concat([self.dist_irw[silv_classif + columns_of_interest],
+                                self.dist_fw[ silv_classif + columns_of_interest]])
 
         # Convert amount_m3 from m3 to tonnes of carbon
         # 'density' is the volumetric mass density in t/m3 of the given species
@@ -415,28 +420,31 @@ class DisturbanceMaker(object):
         # TODO rename amount to amount_tc, this needs to be done also in
         #  orig data for the historical period because these
         #  disturbances will be concatenated to the historical disturbances
-        df['amount'] = df['amount_m3'] * df['density'] / 2
+        amount = source['amount_m3'].values * source['density'].values / 2
 
-        # Drop columns unused by the CBM input format #
-        df = df.drop(columns = ['density', 'amount_m3'])
-
-        # Add and re-order columns
         # These classifiers are ignored when interacting with the economic model only
-        missing_classif = set(self.country.classifiers.names) - set(silv_classif)
-        for col in missing_classif: df[col] = '?'
-
-        # Min age max age are distinguished by hardwood and soft wood #
-        df['sw_start'] = df['min_age']
-        df['sw_end']   = df['max_age']
-        df['hw_start'] = df['min_age']
-        df['hw_end']   = df['max_age']
-
-        # Rename #
-        df = df.rename(columns = {'min_since_last': 'min_since_last_dist',
-                                  'max_since_last': 'max_since_last_dist'})
-
-        # Add constant values required by CBM #
-        df = self.add_constants(df)
+        missing_classif = [c for c in self.country.classifiers.names if c not in silv_classif]
+
+        # Build the table in the CBM input format in one go:
+        # the columns we keep (some renamed), the amount, the missing
+        # classifiers, the hardwood and softwood ages and the constant values
+        renamed = {'min_since_last': 'min_since_last_dist',
+                   'max_since_last': 'max_since_last_dist'}
+        columns = {renamed.get(col, col): source[col].values
+                   for col in silv_classif + columns_of_interest
+                   if col not in ('density', 'amount_m3')}
+        columns['amount'] = amount
+        columns.update(dict.fromkeys(missing_classif, '?'))
+        columns.update({# Min age max age are distinguished by hardwood and soft wood #
+                        'sw_start':            source['min_age'].values,
+                        'sw_end':              source['max_age'].values,
+                        'hw_start':            source['min_age'].values,
+                        'hw_end':              source['max_age'].values})
+        columns.update(self.constants)
+        df = pandas.DataFrame(columns, index=source.index)
+
+        # Use categorical data types for classifiers #
+        df = self.country.classifiers.apply_dtypes(df)
 
         # Check consistency of Sort_Type with measurement type
         # TODO move this to check any disturbances just before SIT is called
@@ -479,7 +487,7 @@ class DisturbanceMaker(object):
         columns_to_keep = ['efficiency']
         # Group and aggregate #
         df = (df
-              .groupby(index + columns_to_keep)
+              .groupby(index + columns_to_keep, observed=True)
               .agg({'amount':    sum,
                     'sw_start':  min,
                     'sw_end':    max,
@@ -9,9 +9,10 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+import os, threading
 
 # Third party modules #
-import numpy
+import numpy, pandas
 
 # First party modules #
 from autopaths            import Path
@@ -21,44 +22,100 @@ from plumbing.databases.access_database import AccessDatabase
 
 # Internal modules #
 from cbmcfs3_runner.pump.common import multi_index_pivot
+from cbmcfs3_runner.pump.checksum import md5sum
+from cbmcfs3_runner.pump.dist_matrices import DistMatrices
 
 # Constants #
 default_path = "/Program Files (x86)/Operational-Scale CBM-CFS3/Admin/DBs/ArchiveIndex_Beta_Install.mdb"
 default_path = Path(default_path)
 
+# Optionally, keep a parquet copy of every AIDB table in this directory #
+cache_dir = os.environ.get("CBMCFS3_AIDB_CACHE")
+
 ###############################################################################
-class AIDB(object):
+class SharedAIDB(object):
     """
-    This class enables us to switch the famous "ArchiveIndexDatabase", between
-    the Canadian standard and the European standard.
-    It also provides access to the data within this database.
+    The tables of one distinct AIDB file. Most countries have an identical
+    copy of the EU AIDB, so the files are identified by the MD5 of their
+    content and each distinct file is parsed only once per process.
+    All the `AIDB` objects sharing the same file use the same data frames,
+    so the attributes of this object must never be modified. The `AIDB`
+    properties return copies of them.
+
+    If the environment variable CBMCFS3_AIDB_CACHE is set, the raw tables
+    are also saved in that directory as parquet files named after the
+    checksum, and read from there by later processes.
+
+    You can use it like this:
+
+        >>> from cbmcfs3_runner.pump.aidb import SharedAIDB
+        >>> shared = SharedAIDB.get('/repos/cbmcfs3_data/countries/AT/orig/aidb_eu.mdb')
+        >>> print(shared.dm_table)
     """
 
-    all_paths = """
-    /orig/aidb_eu.mdb
-    """
+    # All the instances, by checksum #
+    registry = {}
 
-    def __init__(self, parent):
-        # Default attributes #
-        self.parent = parent
-        # Automatically access paths based on a string of many subpaths #
-        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+    # The checksums, by path, size and modification time #
+    checksums = {}
 
-    def switch(self):
-        default_path.remove()
-        self.paths.aidb.copy(default_path)
+    # Only one thread at a time can add to the registry #
+    lock = threading.Lock()
 
+    def __repr__(self):
+        return '%s object with checksum "%s"' % (self.__class__, self.checksum)
+
+    def __init__(self, path, checksum):
+        # Default attributes #
+        self.path     = path
+        self.checksum = checksum
+
+    @classmethod
+    def checksum_of(cls, path):
+        """The MD5 of a file, only computed again if the file changed."""
+        stat = os.stat(path)
+        key  = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in cls.checksums: cls.checksums[key] = md5sum(path)
+        return cls.checksums[key]
+
+    @classmethod
+    def get(cls, path):
+        """The shared instance corresponding to the content of a file."""
+        path     = str(path)
+        checksum = cls.checksum_of(path)
+        with cls.lock:
+            if checksum not in cls.registry: cls.registry[checksum] = cls(path, checksum)
+            return cls.registry[checksum]
+
+    #-------------------------------------------------------------------------#
     @property_cached
     def database(self):
-        database = AccessDatabase(self.paths.aidb)
+        database = AccessDatabase(self.path)
         database.convert_col_names_to_snake = True
         return database
 
+    def cache_path(self, table):
+        """The parquet copy of a table, if a cache directory is set."""
+        if cache_dir is None: return None
+        return os.path.join(cache_dir, self.checksum, table + '.parquet')
+
+    def __getitem__(self, table):
+        """Read a raw table from the parquet cache or from the database."""
+        path = self.cache_path(table)
+        if path is not None and os.path.exists(path): return pandas.read_parquet(path)
+        df = self.database[table]
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+        return df
+
+    #-------------------------------------------------------------------------#
     @property_cached
     def dm_table(self):
         """Main disturbance matrix."""
         # Load #
-        df = self.database['tblDM']
+        df = self['tblDM']
         # Rename #
         df = df.rename(columns={       "name": "dist_desc_dm",
                                 "description": "dist_desc_long"})
@@ -69,7 +126,7 @@ class AIDB(object):
     def source(self):
         """Name of source pools."""
         # Load #
-        df = self.database['tblSourceName']
+        df = self['tblSourceName']
         # Rename #
         df = df.rename(columns={        'row': 'dm_row',
                                 'description': 'row_pool'})
@@ -80,7 +137,7 @@ class AIDB(object):
     def sink(self):
         """Name of sink pools."""
         # Load #
-        df = self.database['tblSinkName']
+        df = self['tblSinkName']
         # Rename #
         df = df.rename(columns={     'column': 'dm_column',
                                 'description': 'column_pool'})
@@ -91,7 +148,7 @@ class AIDB(object):
     def lookup(self):
         """Proportion by source and sink."""
         # Load #
-        df = self.database['tblDMValuesLookup']
+        df = self['tblDMValuesLookup']
         # Return #
         return df
 
@@ -99,7 +156,7 @@ class AIDB(object):
     def dist_type_default(self):
         """Link between dist_type_id and dist_desc_aidb."""
         # Load #
-        df = self.database['tbldisturbancetypedefault']
+        df = self['tbldisturbancetypedefault']
         # Rename #
         df = df.rename(columns = {'dist_type_name': 'dist_desc_aidb'})
         # Return #
@@ -116,7 +173,7 @@ class AIDB(object):
         Shape in the EU AIDB: 110180 rows × 6 columns
         """
         # Load #
-        df = self.database['tbldmassociationdefault']
+        df = self['tbldmassociationdefault']
         # Rename #
         # TODO, check if dist_type_id is exactly the correct name
         df = df.rename(columns = {'default_disturbance_type_id': 'dist_type_id',
@@ -151,7 +208,7 @@ class AIDB(object):
         Shape in the EU aidb: 920 rows × 6 columns
         """
         # Load #
-        df = self.database['tbldmassociationspudefault']
+        df = self['tbldmassociationspudefault']
         # Rename
         # TODO check if dist_type_id is exactly the correct name
         df = df.rename(columns = {'default_disturbance_type_id': 'dist_type_id',
@@ -160,6 +217,92 @@ class AIDB(object):
         # Return #
         return df
 
+    @property_cached
+    def dist_matrices(self):
+        """All the disturbance matrices as sparse matrices, by dmid."""
+        return DistMatrices(self)
+
+###############################################################################
+class AIDB(object):
+    """
+    This class enables us to switch the famous "ArchiveIndexDatabase", between
+    the Canadian standard and the European standard.
+    It also provides access to the data within this database.
+
+    The tables that only depend on the AIDB file itself are parsed once
+    for all countries having an identical file, see `SharedAIDB`.
+    """
+
+    all_paths = """
+    /orig/aidb_eu.mdb
+    """
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+        # Automatically access paths based on a string of many subpaths #
+        self.paths = AutoPaths(self.parent.data_dir, self.all_paths)
+
+    def switch(self):
+        default_path.remove()
+        self.paths.aidb.copy(default_path)
+
+    @property_cached
+    def shared(self):
+        """The tables of this file, shared with identical files."""
+        return SharedAIDB.get(self.paths.aidb)
+
+    # Each country keeps its own cached copy of the shared data frames #
+    # so that modifying them can't affect the other countries #
+    @property
+    def database(self):               return self.shared.database
+    @property_cached
+    def dm_table(self):               return self.shared.dm_table.copy()
+    @property_cached
+    def source(self):                 return self.shared.source.copy()
+    @property_cached
+    def sink(self):                   return self.shared.sink.copy()
+    @property_cached
+    def lookup(self):                 return self.shared.lookup.copy()
+    @property_cached
+    def dist_type_default(self):      return self.shared.dist_type_default.copy()
+    @property_cached
+    def dm_assoc_default(self):       return self.shared.dm_assoc_default.copy()
+    @property_cached
+    def dm_assoc_default_short(self): return self.shared.dm_assoc_default_short.copy()
+    @property_cached
+    def dm_assoc_spu_default(self):   return self.shared.dm_assoc_spu_default.copy()
+    @property
+    def dist_matrices(self):          return self.shared.dist_matrices
+
+    @property_cached
+    def dist_type_map(self):
+        """
+        Map the dist_type_name of the current country to its dmid, as in
+        `dmid_map`, but without building the long disturbance matrix.
+        Use it to pick matrices in `self.dist_matrices`.
+
+        Columns are: ['dist_type_name', 'dmid', 'dist_desc_aidb']
+        """
+        # Load tables from orig_data #
+        map_disturbance = self.parent.associations.map_disturbance
+        dist_types      = self.parent.orig_data.disturbance_types
+        # Same joins as in `dist_matrix_long` #
+        df = self.dm_assoc_default_short.left_join(self.dist_type_default, 'dist_type_id',
+                                                   validate='many_to_one')
+        df = df.left_join(map_disturbance, 'dist_desc_aidb')
+        df = df.left_join(dist_types,      'dist_desc_input')
+        # Keep only the disturbances of the country #
+        df = df.dropna(subset=['dist_type_name'])
+        df = df[['dist_type_name', 'dmid', 'dist_desc_aidb']].drop_duplicates()
+        # Return #
+        return df
+
+    @property_cached
+    def dmid_of(self):
+        """A dictionary of dist_type_name to dmid."""
+        return dict(zip(self.dist_type_map['dist_type_name'], self.dist_type_map['dmid']))
+
     @property_cached
     def dist_matrix_long(self):
         """
@@ -192,23 +335,16 @@ class AIDB(object):
         map_disturbance = self.parent.associations.map_disturbance
         dist_types      = self.parent.orig_data.disturbance_types
         # Join lookup and dm_table to add the description for each `dmid` #
-        dm_lookup = (lookup
-                     .set_index('dmid')
-                     .join(dm_table.set_index('dmid'))
-                     .reset_index())
+        dm_lookup = lookup.left_join(dm_table, 'dmid', validate='many_to_one')
         # Indexes #
         index_source = ['dm_row',    'dm_structure_id']
         index_sink   = ['dm_column', 'dm_structure_id']
         # Add source and sink descriptions #
-        df = (dm_lookup.set_index(index_source)
-                       .join(source.set_index(index_source))
-                       .reset_index()
-                       .set_index(index_sink)
-                       .join(sink.set_index(index_sink))
-                       .reset_index())
+        df = dm_lookup.left_join(source, index_source, validate='many_to_one')
+        df = df.left_join(sink,          index_sink,   validate='many_to_one')
         # Add 'dist_type_name' corresponding to orig/disturbance_types.csv
         df = df.left_join(assoc_short,     'dmid')
-        df = df.left_join(dist_default,    'dist_type_id')
+        df = df.left_join(dist_default,    'dist_type_id', validate='many_to_one')
         df = df.left_join(map_disturbance, 'dist_desc_aidb')
         df = df.left_join(dist_types,      'dist_desc_input')
         # Return #
@@ -252,18 +388,25 @@ class AIDB(object):
         treatments.
 
         The column "perc_merch_biom_rem" comes from silviculture.csv
-        The column "proportion" comes from aidb.mdb and multiple joins.
+        The column "proportion" comes from the sparse disturbance matrices
+        of aidb.mdb, see `self.dist_matrices`.
         """
         # Load #
-        df         = self.dist_matrix_long
+        dist_map   = self.dist_type_map
         dist_types = self.parent.orig_data.disturbance_types
         treats     = self.parent.silviculture.treatments
-        # Filter dist_mat to take only disturbances that are actually used #
-        selector = df['dist_type_name'].isin(dist_types['dist_type_name'])
-        df = df[selector].copy()
-        # Take only products #
-        df = df.query("column_pool == 'products'")
-        df = df.query("row_pool == 'Softwood merchantable' or row_pool == 'Hardwood merch'")
+        matrices   = self.dist_matrices
+        # Take only disturbances that are actually used #
+        selector = dist_map['dist_type_name'].isin(dist_types['dist_type_name'])
+        dist_map = dist_map[selector]
+        # Take only products, read from the sparse matrices #
+        pools = ['Softwood merchantable', 'Hardwood merch']
+        df = pandas.concat([dist_map.assign(row_pool   = pool,
+                                            proportion = matrices.proportions(dist_map['dmid'].values,
+                                                                              pool, 'products'))
+                            for pool in pools])
+        # Only the proportions present in the matrices #
+        df = df.dropna(subset=['proportion'])
         # Join #
         df = treats.left_join(df, 'dist_type_name')
         # Take columns of interest #
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+"""
+
+# Built-in modules #
+import hashlib
+
+###############################################################################
+def md5sum(path, chunk_size=1024*1024):
+    """The MD5 of a file, read by chunks to handle multi-GB databases."""
+    md5 = hashlib.md5()
+    with open(str(path), 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''): md5.update(chunk)
+    return md5.hexdigest()
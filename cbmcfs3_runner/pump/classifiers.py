@@ -9,11 +9,13 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+import warnings
 
 # First party modules #
 from plumbing.cache import property_cached
 
 # Third party modules #
+import pandas
 
 ###############################################################################
 class Classifiers(object):
@@ -79,3 +81,71 @@ class Classifiers(object):
         ['forest_type', 'region', etc.]
         """
         return list(self.mapping)
+
+    # Some classifiers are renamed in the output of some countries #
+    # C.f the "Broad/Conifers" and the PL column problems #
+    aliases = {'broad_conifers':        'conifers_broadleaves',
+               'natural_forest_region': 'management_type'}
+
+    @property_cached
+    def vocabulary(self):
+        """
+        A categorical data type for each classifier, containing all the
+        values listed in "classifiers.csv" plus the wildcard '?' used in
+        disturbances and transitions. Applying these types everywhere
+        ensures classifier columns can be joined and grouped on directly.
+        """
+        # Load the CSV #
+        df = self.parent.orig_data['classifiers']
+        # Get only classifier values #
+        df = df.loc[df['classifier_value_id'] != "_CLASSIFIER"]
+        # One data type per classifier #
+        result = {}
+        for number, values in df.groupby('classifier_number')['classifier_value_id']:
+            name = self.mapping['_' + str(number)]
+            categories = sorted(set(values.astype(str)) | {'?'})
+            result[name] = pandas.CategoricalDtype(categories)
+        # Add aliases #
+        for old, new in self.aliases.items():
+            if old in result and new not in result: result[new] = result[old]
+        # Return #
+        return result
+
+    @staticmethod
+    def to_labels(series):
+        """
+        Convert the values of a classifier column to the strings used in
+        the vocabulary. A number with an integer value loses its decimal
+        part, for instance 1.0 (a column of integers with missing values
+        is read as floats) becomes '1'. Missing values stay missing.
+        """
+        def label(value):
+            if isinstance(value, float) and value.is_integer(): return str(int(value))
+            return str(value)
+        values = series.astype(object)
+        return values.map({v: label(v) for v in values.dropna().unique()})
+
+    def apply_dtypes(self, df, strict=True):
+        """
+        Return a copy of the data frame with every classifier column cast
+        to its categorical data type. Values are first converted to strings
+        with `to_labels` so that numbers such as management strategies
+        match. Missing values stay missing.
+
+        Any other value not in the vocabulary raises an exception instead
+        of being silently lost. With `strict=False`, as for tables coming
+        out of CBM, a warning is issued instead and these values become
+        missing.
+        """
+        columns = {}
+        for name, dtype in self.vocabulary.items():
+            if name not in df.columns: continue
+            values  = self.to_labels(df[name])
+            unknown = set(values.dropna()) - set(dtype.categories)
+            if unknown:
+                msg = "Column '%s' of country '%s' has values not in classifiers.csv: %s"
+                msg = msg % (name, self.parent.iso2_code, sorted(unknown))
+                if strict: raise ValueError(msg)
+                warnings.warn(msg)
+            columns[name] = values.astype(dtype)
+        return df.assign(**columns)
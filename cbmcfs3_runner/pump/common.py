@@ -9,36 +9,87 @@ Unit D1 Bioeconomy.
 """
 
 # Third party modules #
-import pandas
+import pandas, numpy
 
 ###############################################################################
+def factorize_sorted(values):
+    """
+    Like `pandas.factorize(values, sort=True)` but missing values get
+    their own code (placed last) instead of -1.
+    """
+    codes, uniques = pandas.factorize(values, sort=True)
+    uniques = numpy.asarray(uniques)
+    if (codes < 0).any():
+        codes   = numpy.where(codes < 0, len(uniques), codes)
+        uniques = numpy.append(uniques.astype(object), numpy.nan)
+    return codes, uniques
+
 def multi_index_pivot(df, columns=None, values=None):
     """
     Pivot a pandas data frame from long to wide format on multiple index variables.
-    Copied from https://github.com/pandas-dev/pandas/issues/23955
+    Inspired by https://github.com/pandas-dev/pandas/issues/23955
+
+    The index levels of `df` are the rows of the result and the distinct
+    values of the column `columns` become new columns, filled with the
+    column `values`. For instance:
+
+        >>> df = df.set_index(['dmid', 'row_pool'])
+        >>> multi_index_pivot(df, columns='column_pool', values='proportion')
+
+    Each index level is converted to integer codes, the codes are combined
+    in a single integer per row and the values are scattered in a dense
+    array. Rows are sorted like the tuples of the index would be, and
+    missing values in the index form their own group, placed last.
 
     Note: you can perform the opposite operation, i.e.
     unpivot a DataFrame from wide format to long format with df.melt().
     In contrast to `pivot`, `melt` does acccept a multiple index specified
     as the `id_vars` argument.
-
-    TODO: add warning when there is no index set.
-    Otherwise the error message is cryptic:
-    KeyError: "None of [Index([None], dtype='object')] are in the [columns]"
-
-    TODO: add example use for this function
     """
-    names        = list(df.index.names)
-    df           = df.reset_index()
-    list_index   = df[names].values
-    tuples_index = [tuple(i) for i in list_index] # hashable
-    df           = df.assign(tuples_index=tuples_index)
-    df           = df.pivot(index="tuples_index", columns=columns, values=values)
-    tuples_index = df.index  # reduced
-    index        = pandas.MultiIndex.from_tuples(tuples_index, names=names)
-    df.index     = index
-    # Remove confusing index column name #
-    df.columns.name = None
+    # Check the index #
+    names = list(df.index.names)
+    if any(name is None for name in names):
+        msg = "The index of the data frame needs names, use set_index() before pivoting."
+        raise ValueError(msg)
     df = df.reset_index()
+    # Value columns #
+    if values is None: value_cols = [c for c in df.columns if c not in names + [columns]]
+    elif isinstance(values, str): value_cols = [values]
+    else: value_cols = list(values)
+    # Integer codes of every index level #
+    level_codes, level_uniques = zip(*[factorize_sorted(df[name].values) for name in names])
+    shape = tuple(len(u) for u in level_uniques)
+    # Combine them in a single integer and keep only observed combinations #
+    combined = numpy.ravel_multi_index(level_codes, shape)
+    row_codes, row_uniques = pandas.factorize(combined, sort=True)
+    col_codes, col_uniques = factorize_sorted(df[columns].values)
+    # Check for duplicates #
+    cells = row_codes * len(col_uniques) + col_codes
+    if len(numpy.unique(cells)) < len(cells):
+        raise ValueError("Index contains duplicate entries, cannot reshape")
+    # Rebuild the index from the unique codes #
+    unravelled = numpy.unravel_index(row_uniques, shape)
+    result = pandas.DataFrame({name: uniques[codes] for name, uniques, codes
+                               in zip(names, level_uniques, unravelled)})
+    # Scatter values in a dense block, one per value column #
+    complete = len(cells) == len(row_uniques) * len(col_uniques)
+    blocks = []
+    for col in value_cols:
+        block = numpy.full((len(row_uniques), len(col_uniques)), numpy.nan)
+        block[row_codes, col_codes] = df[col].values
+        block = pandas.DataFrame(block, columns=col_uniques)
+        # Keep the original data type when no cell is missing #
+        if complete: block = block.astype(df[col].dtype)
+        blocks.append(block)
+    # Columns are either flat or (value, column) like in DataFrame.pivot #
+    if values is None or not isinstance(values, str):
+        block = pandas.concat(blocks, axis=1, keys=value_cols)
+        result.columns = pandas.MultiIndex.from_tuples([(n, '') for n in names])
+        result = pandas.concat([result, block], axis=1)
+        result.columns.names = [None, columns]
+    else:
+        block = blocks[0]
+        block.columns.name = None
+        result = pandas.concat([result, block], axis=1)
     # Return #
-    return df
+    return result
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+You can use this object like this:
+
+    >>> from cbmcfs3_runner.core.continent import continent
+    >>> aidb = continent.countries['AT'].aidb
+    >>> matrices = aidb.dist_matrices
+    >>> print(matrices.frame(aidb.dmid_of['7']))
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy, pandas
+import scipy.sparse
+
+# First party modules #
+from plumbing.cache import property_cached
+
+# Internal modules #
+
+###############################################################################
+class DistMatrices(object):
+    """
+    All the disturbance matrices of one AIDB file, stored as one sparse
+    matrix per `dmid` with source pools in rows and sink pools in columns.
+    Row number `i` is the source pool with `dm_row == i` and column number
+    `j` is the sink pool with `dm_column == j`, the names of the pools
+    depend on the `dm_structure_id` of each matrix.
+
+    Contrary to the `dist_matrix_long` and `dist_matrix` data frames of
+    the AIDB object, these don't depend on the country. They are built
+    once for every distinct AIDB file, see `SharedAIDB`.
+    """
+
+    def __repr__(self):
+        return '%s object with %i matrices' % (self.__class__, len(self.matrices))
+
+    def __init__(self, parent):
+        # Default attributes #
+        self.parent = parent
+
+    def __getitem__(self, dmid): return self.matrices[dmid]
+    def __iter__(self):          return iter(self.matrices)
+    def __len__(self):           return len(self.matrices)
+
+    #-------------------------------------------------------------------------#
+    @property_cached
+    def shape(self):
+        """The same shape is used for every matrix."""
+        return (int(self.parent.source['dm_row'].max()) + 1,
+                int(self.parent.sink['dm_column'].max()) + 1)
+
+    @property_cached
+    def matrices(self):
+        """A dictionary of `dmid` to sparse matrices of proportions."""
+        result = {}
+        for dmid, df in self.parent.lookup.groupby('dmid'):
+            coords = (df['dm_row'].values, df['dm_column'].values)
+            result[dmid] = scipy.sparse.csr_matrix((df['proportion'].values, coords),
+                                                   shape=self.shape)
+        return result
+
+    @property_cached
+    def structures(self):
+        """A dictionary of `dmid` to `dm_structure_id`."""
+        df = self.parent.lookup[['dmid', 'dm_structure_id']].drop_duplicates()
+        return dict(zip(df['dmid'], df['dm_structure_id']))
+
+    @property_cached
+    def rows(self):
+        """A dictionary of (dm_structure_id, source pool name) to row number."""
+        df = self.parent.source
+        return dict(zip(zip(df['dm_structure_id'], df['row_pool']), df['dm_row']))
+
+    @property_cached
+    def columns(self):
+        """A dictionary of (dm_structure_id, sink pool name) to column number."""
+        df = self.parent.sink
+        return dict(zip(zip(df['dm_structure_id'], df['column_pool']), df['dm_column']))
+
+    @property_cached
+    def entries(self):
+        """
+        The proportions stored in the matrices as a series indexed on
+        the source pool name, the sink pool name and the `dmid`.
+        Built in one pass from the lookup table, where entries appearing
+        several times are summed like in the sparse matrices.
+        """
+        # The stacked coordinates and values of every matrix #
+        cols = ['dmid', 'dm_structure_id', 'dm_row', 'dm_column', 'proportion']
+        df = self.parent.lookup[cols]
+        # Add the pool names #
+        df = df.merge(self.parent.source[['dm_structure_id', 'dm_row', 'row_pool']],
+                      on=['dm_structure_id', 'dm_row'])
+        df = df.merge(self.parent.sink[['dm_structure_id', 'dm_column', 'column_pool']],
+                      on=['dm_structure_id', 'dm_column'])
+        # Return #
+        return df.groupby(['row_pool', 'column_pool', 'dmid'])['proportion'].sum()
+
+    #-------------------------------------------------------------------------#
+    def proportions(self, dmids, source_pool, sink_pool):
+        """
+        The proportion moved from one pool to another, for every `dmid`
+        in a list. Matrices without an entry for these two pools, as well
+        as unknown matrices or pools, give NaN.
+        """
+        index = pandas.MultiIndex.from_arrays([[source_pool] * len(dmids),
+                                               [sink_pool]   * len(dmids),
+                                               dmids])
+        return self.entries.reindex(index).values
+
+    def apply(self, dmid, pools):
+        """
+        Apply a matrix to a vector of source pool values indexed on
+        `dm_row`. Returns the amounts received by each sink pool.
+        """
+        return self.matrices[dmid].T @ numpy.asarray(pools, dtype='float64')
+
+    def difference(self, first, second):
+        """The largest absolute difference between two matrices."""
+        return abs(self.matrices[first] - self.matrices[second]).max()
+
+    def frame(self, dmid):
+        """A matrix as a dense data frame with the pool names, for display."""
+        structure = self.structures[dmid]
+        rows = {v: k[1] for k, v in self.rows.items()    if k[0] == structure}
+        cols = {v: k[1] for k, v in self.columns.items() if k[0] == structure}
+        dense = self.matrices[dmid].toarray()[sorted(rows)][:, sorted(cols)]
+        return pandas.DataFrame(dense,
+                                index   = [rows[i] for i in sorted(rows)],
+                                columns = [cols[j] for j in sorted(cols)])
@@ -14,11 +14,10 @@ You can use this object like this:
 """
 
 # Built-in modules #
-import requests, zipfile
+import os, shutil, tempfile, requests, zipfile
 
 # Third party modules #
 import pandas
-from six import BytesIO
 
 # First party modules #
 from plumbing.cache import property_cached
@@ -27,6 +26,10 @@ from plumbing.cache import property_cached
 from cbmcfs3_runner import module_dir
 from tqdm import tqdm
 
+# The compiled cache is not kept in the package, which can be read-only #
+default_cache = os.path.join(os.path.expanduser('~'), '.cache', 'cbmcfs3_runner')
+cache_dir     = os.environ.get("CBMCFS3_FAOSTAT_CACHE", default_cache)
+
 ###############################################################################
 class Faostat(object):
     """
@@ -41,33 +44,79 @@ class Faostat(object):
     short_names = ['irw_c', 'irw_b', 'fw_c', 'fw_b']
 
     # Constants #
-    faostat_fo_path = module_dir + 'extra_data/faostat_forestry.csv'
+    faostat_fo_path    = module_dir + 'extra_data/faostat_forestry.csv'
+    faostat_cache_path = os.path.join(cache_dir, 'faostat_forestry.parquet')
     url = 'http://fenixservices.fao.org/faostat/static/bulkdownloads/Forestry_E_Europe.zip'
+    file_name = "Forestry_E_Europe_NOFLAG.csv"
 
-    def download(self):
+    def download(self, url=None, chunk_size=1024*1024):
         """A method to automatically downloaded the needed CSV file.
         You should only need to run this once. Use it like this:
 
-            >>> from cbmcfs3_runner.faostat import faostat
+            >>> from cbmcfs3_runner.pump.faostat import faostat
             >>> faostat.download()
-        """
-        # Download it #
-        response = requests.get(self.url, stream=True)
-        total_size = int(response.headers.get('content-length'))
-        block_size = int(total_size/1024)
-        # Do it #
-        zip_file = BytesIO()
-        for data in tqdm(response.iter_content(chunk_size=block_size), total=1024):
-            zip_file.write(data)
-        # Uncompress only one file #
-        zip_archive = zipfile.ZipFile(zip_file)
-        file_name = "Forestry_E_Europe_NOFLAG.csv"
-        # We can't use zip_archive.extract() because it preserves directories #
-        with open(self.faostat_fo_path, 'wb') as handle:
-            handle.write(zip_archive.read(file_name))
 
-    @property_cached
-    def forestry(self):
+        The zip file is streamed to a temporary file on disk instead of
+        being kept in memory. Only the CSV we need is then extracted, also
+        by streaming it, and the CRC of the zip is verified in the process.
+        The CSV is moved in place only once complete, and finally the
+        compiled cache is rebuilt.
+
+        You can pass a different `url`, for instance a local HTTP server
+        serving a small zip file when testing.
+        """
+        # Default URL #
+        if url is None: url = self.url
+        # Start the download #
+        response = requests.get(url, stream=True)
+        response.raise_for_status()
+        # The size is not always announced by the server #
+        total_size = response.headers.get('content-length')
+        total_size = int(total_size) if total_size else None
+        # If the body is encoded (e.g. gzip) the size is not the one we receive #
+        if response.headers.get('content-encoding'): total_size = None
+        # Spool the zip to disk #
+        with tempfile.TemporaryFile() as zip_file:
+            with tqdm(total=total_size, unit='B', unit_scale=True) as bar:
+                for data in response.iter_content(chunk_size=chunk_size):
+                    zip_file.write(data)
+                    bar.update(len(data))
+            # Check we got everything #
+            if total_size is not None and zip_file.tell() != total_size:
+                msg = "Download of '%s' incomplete: got %i bytes instead of %i."
+                raise IOError(msg % (url, zip_file.tell(), total_size))
+            # Uncompress only one file #
+            # We can't use zip_archive.extract() because it preserves directories #
+            self.extract(zipfile.ZipFile(zip_file), chunk_size)
+        # Rebuild the cache #
+        self.compile()
+
+    def extract(self, zip_archive, chunk_size=1024*1024):
+        """
+        Stream the CSV we need out of the zip archive to a temporary file
+        next to its final destination, then move it in place.
+        Reading the member to the end checks its CRC, so a corrupted
+        archive raises an exception and leaves the previous CSV untouched.
+        The temporary file is only readable by us, so the final file gets
+        the usual permissions given by the umask.
+        """
+        # The permissions a new file would normally get #
+        umask = os.umask(0)
+        os.umask(umask)
+        # Extract #
+        dest_dir = os.path.dirname(str(self.faostat_fo_path))
+        handle   = tempfile.NamedTemporaryFile(dir=dest_dir, delete=False)
+        try:
+            with zip_archive.open(self.file_name) as member, handle:
+                shutil.copyfileobj(member, handle, chunk_size)
+        except Exception:
+            os.remove(handle.name)
+            raise
+        # Move in place #
+        os.chmod(handle.name, 0o666 & ~umask)
+        os.replace(handle.name, str(self.faostat_fo_path))
+
+    def reshape(self, df):
         """
         Transform the raw data table to something adapted to our needs.
         For instance, We need to use DataFrame.stack() to place the
@@ -79,54 +128,98 @@ class Faostat(object):
         Furthermore, we are only interested in these products mentioned
         in self.products
 
-        The units are cubic meters under bark in the column 'value'.
+        The units are cubic meters under bark in the column 'value_ub'.
+
+        All operations are vectorised and we filter rows and columns
+        before stacking the years so that we only reshape what we keep.
+
+        Columns in the output are:
 
-        Columns in the output are: ???
+            ['area_code', 'country', 'item_code', 'product', 'element_code',
+             'element', 'unit', 'year', 'value_ub', 'hwp', 'conifers_broadleaves']
         """
         # Import internal modules #
         from cbmcfs3_runner.core.country import all_codes, ref_years
-        # Read #
-        df = pandas.read_csv(str(self.faostat_fo_path))
         # Rename all columns to lower case #
         df = df.rename(columns=lambda name: name.replace(' ', '_').lower())
         # Areas are actually countries, items are products #
         df = df.rename(columns={'area': 'country', 'item': 'product'})
         # Columns we want to keep #
         cols_to_keep = ['area_code', 'country', 'item_code', 'product', 'element_code', 'element', 'unit']
+        # Remove countries and products we don't need #
+        iso2_codes = all_codes.set_index('country')['iso2_code']
+        short_names = dict(zip(self.products, self.short_names))
+        selector  = df['country'].isin(iso2_codes.index)
+        selector &= df['product'].isin(self.products)
+        df = df.loc[selector]
+        # Only keep the year columns from 1990 on, their names look like 'y1990' #
+        min_year  = ref_years['ref_year'].min()
+        year_cols = [c for c in df.columns if c not in cols_to_keep and int(c[1:]) >= min_year]
         # Get rid of all the remaining columns by pivoting the table #
-        df = df.set_index(cols_to_keep)
-        df = df.stack()
-        # For an unknown reason we get a Series instead of a DataFrame with a multilevel #
-        df = pandas.DataFrame(df)
-        # This will leave us with columns '0' and 'level_7' #
-        df = df.reset_index()
-        # Rename #
-        df = df.rename(columns={'level_7': 'year', 0: 'value'})
+        # Missing values are dropped as they would be by older versions of pandas #
+        df = df.set_index(cols_to_keep)[year_cols].stack().dropna()
+        # This will leave us with a series, name it and make the index into columns #
+        df = df.rename('value_ub').rename_axis(cols_to_keep + ['year']).reset_index()
         # Make the years true numerical values #
-        df['year'] = df['year'].apply(lambda x: int(x[1:]))
-        # Filter below year 1990 #
-        min_year = ref_years['ref_year'].min()
-        selector = df['year'] >= min_year
-        df = df[selector].copy()
-        # Remove countries we don't need #
-        selector = df['country'].isin(all_codes['country'])
-        df = df[selector].copy()
+        df['year'] = df['year'].str[1:].astype(int)
         # Add the correct iso2 code #
-        df = df.replace({"country": all_codes.set_index('country')['iso2_code']})
-        # Filter products #
-        selector = df['product'].isin(self.products)
-        df = df[selector].copy()
+        df['country'] = df['country'].map(iso2_codes)
         # Rename the products to their shorter names #
-        df = df.replace({'product': dict(zip(self.products, self.short_names))})
         # This corresponds to our "hwp" column elsewhere #
-        df['hwp'] = df['product']
+        df['hwp'] = df['product'].map(short_names)
         # Split the column into two and keep hwp #
-        df['product'], df['conifers_broadleaves'] = df['hwp'].str.split('_', 1).str
-        # The value is under bark #
-        df = df.rename(columns={'value': 'value_ub'})
+        split = df['hwp'].str.split('_', n=1, expand=True)
+        df['product'], df['conifers_broadleaves'] = split[0], split[1]
+        # Use categorical variables for the repeated text columns #
+        categoricals = ['country', 'product', 'hwp', 'conifers_broadleaves']
+        df[categoricals] = df[categoricals].astype('category')
         # Return #
         return df
 
+    def compile(self):
+        """
+        Reshape the wide CSV file and save the result in long format to
+        a parquet file. This is done automatically the first time the
+        data is accessed and whenever the CSV file is newer than the cache.
+        The parquet file is in '~/.cache/cbmcfs3_runner/' or in the
+        directory given by the environment variable CBMCFS3_FAOSTAT_CACHE.
+        """
+        df = self.reshape(pandas.read_csv(str(self.faostat_fo_path)))
+        os.makedirs(os.path.dirname(str(self.faostat_cache_path)), exist_ok=True)
+        df.to_parquet(str(self.faostat_cache_path), index=False)
+        return df
+
+    @property
+    def cache_is_stale(self):
+        """Is the compiled cache missing or older than the CSV file?"""
+        if not os.path.exists(str(self.faostat_cache_path)): return True
+        cache_time = os.path.getmtime(str(self.faostat_cache_path))
+        csv_time   = os.path.getmtime(str(self.faostat_fo_path))
+        return csv_time > cache_time
+
+    @property_cached
+    def forestry(self):
+        """
+        The forestry data for all countries in long format, see `reshape`.
+        Loaded from the compiled cache, which is rebuilt if needed.
+        """
+        if self.cache_is_stale: return self.compile()
+        return pandas.read_parquet(str(self.faostat_cache_path))
+
+    @property_cached
+    def by_country(self):
+        """
+        A dictionary of iso2 codes to the forestry data of that country,
+        without the 'country' column.
+        """
+        grouped = self.forestry.groupby('country', observed=True)
+        return {iso: df.drop(columns='country') for iso, df in grouped}
+
+    def country(self, iso2_code):
+        """The forestry data of one country, empty if FAOSTAT has none."""
+        empty = self.forestry.iloc[0:0].drop(columns='country')
+        return self.by_country.get(iso2_code, empty)
+
 ###############################################################################
 # Make a singleton #
 faostat = Faostat()
\ No newline at end of file
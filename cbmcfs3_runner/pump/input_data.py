@@ -25,11 +25,18 @@ class InputData(object):
     """
     This class will provide access to the input data of a Runner
     as a pandas data frame.
+
+    The tables are read from the parquet copies that the pre-processor
+    writes next to the input CSVs. Only if these are missing (e.g. for
+    runners that were pre-processed before this was introduced) do we
+    fall back to parsing the Excel file given to SIT, which is slow.
     """
 
     all_paths = """
     /input/xls/default_tables.xls
     /input/xls/append_tables.xls
+    /input/parquet/disturbance_events.parquet
+    /input/parquet/disturbance_types.parquet
     """
 
     def __init__(self, parent):
@@ -58,6 +65,17 @@ class InputData(object):
         df = df.rename(columns=camel_to_snake)
         return df
 
+    def get_table(self, file_name, sheet_name):
+        """
+        Get a specific table from its parquet copy if it exists,
+        otherwise from the corresponding sheet in the first excel.
+        """
+        path = self.paths[file_name]
+        if not path.exists: return self.get_sheet(sheet_name)
+        df = pandas.read_parquet(str(path))
+        df = df.rename(columns=camel_to_snake)
+        return df
+
     #-------------------------- Specific sheets ------------------------------#
     @property_cached
     def disturbance_events(self):
@@ -78,7 +96,7 @@ class InputData(object):
          'measurement_type', 'amount', 'dist_type_name', 'step']
         """
         # Get the right sheet #
-        df = self.get_sheet("DistEvents")
+        df = self.get_table('disturbance_events', "DistEvents")
         # Harmonize the dist_type_id data type amongst countries
         df['dist_type_name'] = df['dist_type_name'].astype(str)
         # Return #
@@ -90,7 +108,7 @@ class InputData(object):
         Columns are: ['dist_type_name', 'name']
         """
         # Get the right sheet #
-        df = self.get_sheet("DistType")
+        df = self.get_table('disturbance_types', "DistType")
         # dist_type_name has to be strings for joining purposes #
         df['dist_type_name'] = df['dist_type_name'].astype(str)
         # Return #
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+Functions to inspect log files that can be very large without reading
+them entirely in memory. You can use them like this:
+
+    >>> from cbmcfs3_runner.pump.log_reader import ends_with, scan
+    >>> ends_with(runner.paths.log, 'Done')
+    >>> scan(runner.paths.log, {'done': 'run is completed'})
+
+To see the end of a log file, use the `tail` method of autopaths'
+`FilePath`, which also reads the file from the end.
+"""
+
+# Built-in modules #
+import os, re
+
+# Third party modules #
+
+# First party modules #
+
+# Internal modules #
+
+# Constants #
+block_size = 1024
+
+###############################################################################
+def ends_with(path, suffix, encoding='utf-8'):
+    """
+    Check the end of a file by reading only the last few bytes.
+    Trailing line endings are ignored, so that a last line "Done" ends
+    with "Done" whether it is followed by a Windows or a Unix newline.
+    """
+    suffix = suffix.encode(encoding)
+    with open(str(path), 'rb') as handle:
+        size = handle.seek(0, os.SEEK_END)
+        handle.seek(max(0, size - len(suffix) - block_size))
+        return handle.read().rstrip(b'\r\n').endswith(suffix)
+
+###############################################################################
+def scan(path, patterns, flags=0, encoding='utf-8'):
+    """
+    Stream through a file line by line and report which patterns are found.
+    The `patterns` is a dictionary of names to regular expressions, they
+    are compiled once. The scan stops as soon as every pattern was found.
+
+    Returns a dictionary of names to booleans, for instance:
+
+        >>> scan(path, {'error': 'error', 'done': '^Done$'}, re.IGNORECASE)
+        {'error': False, 'done': True}
+    """
+    # Compile #
+    compiled = {name: re.compile(pattern, flags) for name, pattern in patterns.items()}
+    found    = dict.fromkeys(patterns, False)
+    missing  = dict(compiled)
+    # Iterate #
+    with open(str(path), encoding=encoding, errors='replace') as handle:
+        for line in handle:
+            for name, regex in list(missing.items()):
+                if regex.search(line):
+                    found[name] = True
+                    del missing[name]
+            if not missing: break
+    # Return #
+    return found
@@ -69,6 +69,8 @@ class OrigData(object):
         df['age_class'] = df['age_class'].mask(~df['using_id'])
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
+        # Use categorical data types #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
@@ -88,6 +90,8 @@ class OrigData(object):
         df = self['yields']
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
+        # Use categorical data types #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
@@ -98,6 +102,8 @@ class OrigData(object):
         df = self['historical_yields']
         # Rename classifiers #
         df = df.rename(columns = self.parent.classifiers.mapping)
+        # Use categorical data types #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
@@ -174,7 +180,8 @@ class OrigData(object):
         df = df.rename(columns = self.parent.classifiers.mapping)
         # Change variables to string to harmonize data types #
         df['dist_type_name'] = df['dist_type_name'].astype('str')
-        df['climatic_unit'] = df['climatic_unit'].astype('str')
+        # Use categorical data types for classifiers #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
@@ -209,7 +216,8 @@ class OrigData(object):
         df = df.rename(columns=mapping)
         # Change variable to strings to harmonize data types #
         df['dist_type_name'] = df['dist_type_name'].astype('str')
-        df['climatic_unit'] = df['climatic_unit'].astype('str')
+        # Use categorical data types for classifiers #
+        df = self.parent.classifiers.apply_dtypes(df)
         # Return #
         return df
 
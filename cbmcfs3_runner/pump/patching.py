@@ -18,18 +18,73 @@ import pandas
 # Internal modules #
 
 ###############################################################################
-def flexible_join(first, other, on, how=None, lsuffix='', rsuffix=''):
-    """Implement a common join pattern with pandas set_index()
-    on both data frames followed by a reset_index() at the end."""
-    # Check if `on` is a set #
+def decategorize(series):
+    """
+    Convert a categorical series to the type of its categories. Integer
+    categories with missing values become the nullable 'Int64' type since
+    a plain integer type can't hold them.
+    """
+    categories = series.dtype.categories.dtype
+    if categories.kind in 'iu' and series.isna().any():
+        return series.astype('Int64')
+    return series.astype(categories)
+
+def check_key_dtypes(first, other, on):
+    """
+    Check that the key columns have compatible types on both sides of a
+    join and return both data frames ready to be merged.
+
+    * A categorical key facing a key that isn't categorical with the same
+      categories is converted to the type of its categories, see
+      `decategorize`.
+    * A key containing strings facing a numeric key raises a TypeError,
+      as this join would otherwise silently produce only missing values.
+    """
+    infer = pandas.api.types.infer_dtype
+    for key in on:
+        left, right = first[key].dtype, other[key].dtype
+        if left == right: continue
+        # Categoricals with different categories are compared by value #
+        if isinstance(left, pandas.CategoricalDtype):
+            first = first.assign(**{key: decategorize(first[key])})
+        if isinstance(right, pandas.CategoricalDtype):
+            other = other.assign(**{key: decategorize(other[key])})
+        # Strings can't match numbers #
+        kinds = {infer(first[key], skipna=True), infer(other[key], skipna=True)}
+        numeric = {'integer', 'floating', 'mixed-integer-float', 'decimal'}
+        if 'string' in kinds and kinds & numeric:
+            msg = "The join key '%s' is %s on the left side but %s on the right side."
+            raise TypeError(msg % (key, left, right))
+    return first, other
+
+def flexible_join(first, other, on, how=None, lsuffix='', rsuffix='', validate=None):
+    """
+    Implement a common join pattern: the result is the same as calling
+    set_index() on both data frames, join() and then reset_index() at the
+    end, i.e. the key columns come first. But we use merge() directly on
+    the columns to avoid copying both data frames to build the indexes.
+
+    The types of the key columns are checked on both sides, see
+    `check_key_dtypes`. Optionally, `validate` can be one of 'one_to_one',
+    'one_to_many', 'many_to_one' or 'many_to_many' to check the
+    cardinality of the join, as in pandas.merge().
+    """
+    # Check if `on` is a set or a single column #
     if isinstance(on, set): on = list(on)
-    # Set indexes #
-    first  = first.set_index(on)
-    other  = other.set_index(on)
-    # TODO check the data types (dtypes) of all the index columns
-    #  are matching on both sides of the join.
-    result = first.join(other, how=how, lsuffix=lsuffix, rsuffix=rsuffix)
-    result = result.reset_index()
+    if isinstance(on, str): on = [on]
+    # Check the data types of all the key columns #
+    first, other = check_key_dtypes(first, other, on)
+    # Overlapping columns need a suffix like with join() #
+    overlap = (set(first.columns) & set(other.columns)) - set(on)
+    if overlap and not (lsuffix or rsuffix):
+        msg = "Columns overlap but no suffix specified: %s" % sorted(overlap)
+        raise ValueError(msg)
+    # Join #
+    result = first.merge(other, how=how, on=on, suffixes=(lsuffix, rsuffix),
+                         validate=validate)
+    # Put the key columns first #
+    columns = on + [c for c in result.columns if c not in on]
+    if list(result.columns) != columns: result = result[columns]
     # Return #
     return result
 
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+You can use this object like this:
+
+    >>> from cbmcfs3_runner.pump.sync import Sync, RcloneTransport
+    >>> transport = RcloneTransport('jrcbox:/Forbiomod/cbmcfs3_data/countries/AT/')
+    >>> sync = Sync('/repos/cbmcfs3_data/countries/AT/', transport, threads=4)
+    >>> sync()
+
+Or, between two local directories:
+
+    >>> from cbmcfs3_runner.pump.sync import Sync, LocalTransport
+    >>> Sync('/tmp/source/', LocalTransport('/tmp/destination/'))()
+"""
+
+# Built-in modules #
+import os, json, shutil, hashlib, tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Third party modules #
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.pump.checksum import md5sum
+
+# Constants #
+manifest_name = '.sync_manifest.json'
+
+# Where the manifests of the source directories are kept #
+default_cache = os.path.join(os.path.expanduser('~'), '.cache', 'cbmcfs3_runner', 'sync')
+cache_dir     = os.environ.get("CBMCFS3_SYNC_CACHE", default_cache)
+
+###############################################################################
+class Manifest(object):
+    """
+    The list of files contained in a directory along with their size,
+    modification time and MD5 checksum. It is saved as a JSON file so that
+    checksums of files whose size and modification time have not changed
+    are never computed twice.
+
+    The JSON file is not written inside the directory, which is left
+    untouched, but in a cache directory (by default '~/.cache/cbmcfs3_runner/sync/'
+    or the one given by the environment variable CBMCFS3_SYNC_CACHE), under
+    a name derived from the absolute path of the directory. A different
+    location can be given with `path`.
+    """
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.directory)
+
+    def __init__(self, directory, exclude=('.git',), path=None):
+        self.directory = str(directory)
+        self.exclude   = set(exclude) | {manifest_name}
+        self.path      = path if path is not None else self.default_path()
+
+    def default_path(self):
+        """The JSON file in the cache directory for this directory."""
+        key = hashlib.md5(os.path.abspath(self.directory).encode('utf-8')).hexdigest()
+        return os.path.join(cache_dir, key + '.json')
+
+    def load(self):
+        """The entries saved on disk, or an empty dictionary."""
+        if not os.path.exists(self.path): return {}
+        with open(self.path) as handle: return json.load(handle)
+
+    def dump(self, entries):
+        """Save the entries on disk."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w') as handle:
+            json.dump(entries, handle, indent=1, sort_keys=True)
+
+    def relative_paths(self):
+        """Every file below the directory, skipping excluded names."""
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = sorted(d for d in dirs if d not in self.exclude)
+            for name in sorted(files):
+                if name in self.exclude: continue
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.directory).replace(os.sep, '/')
+
+    def scan(self):
+        """
+        Walk the directory and return the up-to-date entries, reusing the
+        previous checksum when a file has kept the same size and mtime.
+        The result is also saved on disk.
+        """
+        previous = self.load()
+        entries  = {}
+        for rel_path in self.relative_paths():
+            stat  = os.stat(os.path.join(self.directory, rel_path))
+            entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+            old   = previous.get(rel_path)
+            if old and old['size'] == entry['size'] and old['mtime'] == entry['mtime']:
+                entry['md5'] = old['md5']
+            else:
+                entry['md5'] = md5sum(os.path.join(self.directory, rel_path))
+            entries[rel_path] = entry
+        self.dump(entries)
+        return entries
+
+###############################################################################
+class LocalTransport(object):
+    """Copies files to a destination directory on a mounted file system."""
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.base)
+
+    def __init__(self, base):
+        self.base = str(base)
+
+    def read(self, rel_path):
+        """The text of a file at the destination or None if missing."""
+        path = os.path.join(self.base, rel_path)
+        if not os.path.exists(path): return None
+        with open(path) as handle: return handle.read()
+
+    def write(self, text, rel_path):
+        """Write text to a file at the destination."""
+        path = os.path.join(self.base, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as handle: handle.write(text)
+
+    def put(self, source, rel_path):
+        """Copy a file to the destination, preserving its modification time."""
+        path = os.path.join(self.base, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy2(source, path)
+
+###############################################################################
+class RcloneTransport(object):
+    """
+    Copies files to any remote supported by rclone, for instance
+    'jrcbox:/Forbiomod/SourceData/EFDM/cbmcfs3_data/'.
+    """
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.base)
+
+    def __init__(self, base, executable='rclone'):
+        self.base       = base.rstrip('/') + '/'
+        self.executable = executable
+
+    @property
+    def rclone(self):
+        import pbs3
+        return pbs3.Command(self.executable)
+
+    def read(self, rel_path):
+        """The text of a remote file or None if missing."""
+        import pbs3
+        try: return str(self.rclone('cat', self.base + rel_path))
+        except pbs3.ErrorReturnCode: return None
+
+    def write(self, text, rel_path):
+        """Write text to a remote file, going through a temporary file."""
+        handle = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        try:
+            with handle: handle.write(text)
+            self.put(handle.name, rel_path)
+        finally:
+            os.remove(handle.name)
+
+    def put(self, source, rel_path):
+        """Copy one file to the remote."""
+        self.rclone('copyto', source, self.base + rel_path)
+
+###############################################################################
+class Sync(object):
+    """
+    Incrementally copies a directory (typically a runner or country
+    directory) to a destination reached through a transport.
+
+    A manifest of checksums is kept for the source directory in a cache
+    directory (see `Manifest`) and another one at the destination. Only
+    files whose checksum differs from the one recorded at the destination
+    are transferred, with at most `threads` transfers running at the same
+    time. The destination manifest is updated at the end, including when
+    some transfers failed, so that the next call picks up where this one
+    stopped.
+
+    Files deleted from the source are not deleted at the destination.
+
+    The `progress` argument is an optional function that will be called
+    after each file is transferred with the arguments:
+    (relative path, number of files done, total number of files).
+    """
+
+    def __repr__(self):
+        return '%s object on "%s"' % (self.__class__, self.source_dir)
+
+    def __init__(self, source_dir, transport, threads=4, exclude=('.git',),
+                 progress=None):
+        self.source_dir = str(source_dir)
+        self.transport  = transport
+        self.threads    = threads
+        self.manifest   = Manifest(source_dir, exclude)
+        self.progress   = progress
+
+    def remote_entries(self):
+        """The manifest found at the destination."""
+        text = self.transport.read(manifest_name)
+        return json.loads(text) if text else {}
+
+    def changed(self, local, remote):
+        """The relative paths of files that need to be transferred."""
+        return [rel_path for rel_path, entry in local.items()
+                if remote.get(rel_path, {}).get('md5') != entry['md5']]
+
+    def __call__(self):
+        """Transfer changed files and return the list of their relative paths."""
+        # Compare both sides #
+        local   = self.manifest.scan()
+        remote  = self.remote_entries()
+        changed = self.changed(local, remote)
+        if not changed: return []
+        # Transfer in parallel #
+        failed = None
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            futures = {pool.submit(self.transport.put,
+                                   os.path.join(self.source_dir, rel_path),
+                                   rel_path): rel_path
+                       for rel_path in changed}
+            for done, future in enumerate(as_completed(futures), 1):
+                rel_path = futures[future]
+                if future.exception() is not None:
+                    failed = failed or future.exception()
+                    continue
+                remote[rel_path] = local[rel_path]
+                if self.progress: self.progress(rel_path, done, len(changed))
+        # Record what is now at the destination #
+        remote = {k: v for k, v in remote.items() if k in local}
+        self.transport.write(json.dumps(remote, indent=1, sort_keys=True), manifest_name)
+        # Report the first error if any #
+        if failed is not None: raise failed
+        # Return #
+        return changed
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Written by Lucas Sinclair and Paul Rougieux.
+
+JRC biomass Project.
+Unit D1 Bioeconomy.
+
+You can use this object like this:
+
+    >>> from cbmcfs3_runner.pump.zip_export import ZipExport
+    >>> export = ZipExport('~/exports/ipcc_pools.zip')
+    >>> export({'AT.csv': '/path/to/AT/ipcc_pools.csv',
+    ...         'BE.csv': lambda: some_data_frame})
+"""
+
+# Built-in modules #
+import io, shutil, zipfile, collections
+from concurrent.futures import ThreadPoolExecutor
+
+# Third party modules #
+import pandas
+
+# First party modules #
+from autopaths import Path
+
+# Constants #
+compressions = {'stored':  zipfile.ZIP_STORED,
+                'deflate': zipfile.ZIP_DEFLATED,
+                'bzip2':   zipfile.ZIP_BZIP2,
+                'lzma':    zipfile.ZIP_LZMA}
+
+###############################################################################
+class ZipExport(object):
+    """
+    Writes many members into a single zip archive, streaming each one
+    directly into the archive. Nothing is copied to a temporary directory.
+
+    A member can be either:
+
+     * The path to a file on disk.
+     * A pandas data frame, that will be written as CSV.
+     * A function without arguments returning such a data frame. It is
+       only called when the member is written, so that only one table
+       (or `threads` tables) are held in memory at any time.
+
+    If `threads` is larger than one, the data frames are computed and
+    rendered to CSV in parallel. Note that this is the only thing done in
+    parallel: the compression itself, as well as the members that are
+    paths to files, are still handled by a single thread. So only members
+    given as functions get faster. The archive is the same in both modes:
+    same member names and same compression.
+
+    The `progress` argument is an optional function that will be called
+    after each member is written with the arguments:
+    (arcname, number of members done, total number of members).
+    """
+
+    def __init__(self, dest_zip, compression='deflate', threads=1, progress=None):
+        # Check the compression #
+        if compression not in compressions:
+            msg = "Compression '%s' is not one of %s."
+            raise ValueError(msg % (compression, list(compressions)))
+        # Attributes #
+        self.dest_zip    = Path(dest_zip)
+        self.compression = compression
+        self.threads     = threads
+        self.progress    = progress
+
+    def __call__(self, members):
+        """Write every member (a dictionary of arcname to source) to the zip."""
+        # Pick the method #
+        if self.threads > 1: items = self.compress_parallel(members)
+        else:                items = self.compress_serial(members)
+        # Report #
+        total = len(members)
+        for done, arcname in enumerate(items, 1):
+            if self.progress: self.progress(arcname, done, total)
+        # Return #
+        return self.dest_zip
+
+    #-------------------------------------------------------------------------#
+    @staticmethod
+    def load(source):
+        """Return a data frame or a path from a member source."""
+        if callable(source): return source()
+        return source
+
+    @staticmethod
+    def write_source(source, handle):
+        """Write a data frame or the contents of a file to a binary handle."""
+        if isinstance(source, pandas.DataFrame):
+            text = io.TextIOWrapper(handle, encoding='utf-8', newline='')
+            source.to_csv(text, index=False)
+            text.detach()
+        else:
+            with open(str(source), 'rb') as stream:
+                shutil.copyfileobj(stream, handle, 1024*1024)
+
+    def compress_serial(self, members):
+        """Stream one member after the other through the zip compressor."""
+        mode = compressions[self.compression]
+        with zipfile.ZipFile(str(self.dest_zip), 'w', mode) as archive:
+            for arcname, source in members.items():
+                with archive.open(arcname, 'w', force_zip64=True) as handle:
+                    self.write_source(self.load(source), handle)
+                yield arcname
+
+    def render_member(self, source):
+        """Produce the CSV bytes of a data frame, or pass a path through."""
+        source = self.load(source)
+        if not isinstance(source, pandas.DataFrame): return source
+        buffer = io.BytesIO()
+        self.write_source(source, buffer)
+        return buffer.getvalue()
+
+    def compress_parallel(self, members):
+        """
+        Render members with a pool of threads and write them to the zip
+        as they become ready, in their original order. To bound memory
+        usage, only `threads` members are ever in flight.
+        """
+        items   = iter(members.items())
+        pending = collections.deque()
+        mode    = compressions[self.compression]
+        with ThreadPoolExecutor(max_workers=self.threads) as pool, \
+             zipfile.ZipFile(str(self.dest_zip), 'w', mode) as archive:
+            # Fill the queue then write the oldest member as soon as it's ready #
+            while True:
+                for arcname, source in items:
+                    pending.append((arcname, pool.submit(self.render_member, source)))
+                    if len(pending) >= self.threads: break
+                if not pending: break
+                arcname, future = pending.popleft()
+                with archive.open(arcname, 'w', force_zip64=True) as handle:
+                    result = future.result()
+                    if isinstance(result, bytes): handle.write(result)
+                    else: self.write_source(result, handle)
+                yield arcname
@@ -9,6 +9,7 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
+from operator import attrgetter
 
 # Third party modules #
 
@@ -16,12 +17,12 @@ Unit D1 Bioeconomy.
 import autopaths
 from autopaths            import Path
 from autopaths.auto_paths import AutoPaths
-from autopaths.tmp_path   import new_temp_dir
 from plumbing.cache       import property_cached
 from tqdm import tqdm
 
 # Internal modules #
 from cbmcfs3_runner.reports.scenario import ScenarioReport
+from cbmcfs3_runner.pump.zip_export  import ZipExport
 
 ###############################################################################
 class Scenario(object):
@@ -78,7 +79,7 @@ class Scenario(object):
         summary.close()
 
     # ------------------------------ Others ----------------------------------#
-    def make_csv_zip(self, csv_name, dest_dir):
+    def make_csv_zip(self, csv_name, dest_dir, **kwargs):
         """
         Will make a zip file will the specified CSV file from every country
         together and place it in the given destination directory.
@@ -86,27 +87,48 @@ class Scenario(object):
 
         >>> f = scenario.make_csv_zip('ipcc_pools', '~/exports/for_sarah/')
         >>> print(f)
+
+        Each CSV is streamed directly into the archive. The optional keyword
+        arguments `compression`, `threads` and `progress` are passed to
+        `ZipExport`, see its documentation.
         """
         # Files to put in the zip #
         files = {iso: rl[-1].post_processor.csv_maker.paths(csv_name)
                  for iso, rl in self.runners.items()}
         # Actual name of CSV file #
         csv_full_name = next(iter(files.items()))[1].name
+        # Members of the archive #
+        members = {iso + '.csv': f for iso, f in files.items()}
+        # Compress #
+        return self.zip_members(members, csv_full_name, dest_dir, **kwargs)
+
+    def make_table_zip(self, table, dest_dir, **kwargs):
+        """
+        Same as above but for any table that the post-processor can produce,
+        even if it was never exported to CSV. The `table` is the attribute
+        path relative to the post-processor. For instance you can do:
+
+        >>> f = scenario.make_table_zip('harvest.exp_prov_by_volume', '~/exports/')
+        >>> print(f)
+
+        Tables are computed one runner at a time, when they are written.
+        """
+        # Function to compute the table of one runner #
+        def get_table(runner):
+            return lambda: attrgetter(table)(runner.post_processor)
+        # Members of the archive #
+        members = {iso + '.csv': get_table(rl[-1])
+                   for iso, rl in self.runners.items()}
+        # Compress #
+        return self.zip_members(members, table + '.csv', dest_dir, **kwargs)
+
+    def zip_members(self, members, zip_name, dest_dir, **kwargs):
+        """Stream the given members into a zip in the destination directory."""
         # Destination directory #
         dest_dir = Path(dest_dir)
         # If it's not a directory #
         assert isinstance(dest_dir, autopaths.dir_path.DirectoryPath)
         # Destination zip file #
-        dest_zip = dest_dir + csv_full_name + '.zip'
-        # Temporary directory #
-        tmp_dir = new_temp_dir()
-        zip_dir = tmp_dir + csv_full_name + '/'
-        zip_dir.create()
-        # Copy #
-        for iso, f in files.items(): f.copy(zip_dir + iso + '.csv')
+        dest_zip = dest_dir + zip_name + '.zip'
         # Compress #
-        zip_dir.zip_to(dest_zip)
-        # Remove #
-        tmp_dir.remove()
-        # Return #
-        return dest_zip
\ No newline at end of file
+        return ZipExport(dest_zip, **kwargs)(members)
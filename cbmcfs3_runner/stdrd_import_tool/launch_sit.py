@@ -9,7 +9,7 @@ Unit D1 Bioeconomy.
 """
 
 # Built-in modules #
-import os, zipfile, io
+import os, re, zipfile, io
 from six.moves.urllib.request import urlopen
 
 # Third party modules #
@@ -24,6 +24,7 @@ from plumbing.databases.access_database import AccessDatabase
 # Internal modules #
 from cbmcfs3_runner.stdrd_import_tool.create_json import CreateJSON
 from cbmcfs3_runner.stdrd_import_tool.create_xls  import CreateXLS
+from cbmcfs3_runner.pump.log_reader               import scan, ends_with
 
 ###############################################################################
 class LaunchSIT(object):
@@ -114,11 +115,11 @@ class LaunchSIT(object):
     def check_for_errors(self):
         """This method has not been checked yet."""
         # Let's check for the word error, you never know #
-        if "error" in self.paths.log.contents.lower():
+        if scan(self.paths.log, {'error': 'error'}, re.IGNORECASE)['error']:
             raise Exception("SIT did not run properly.")
         # For some reason when appending we don't get the "Done" at the end #
         if not self.append:
-            assert self.paths.log.contents.endswith("Done\n")
+            assert ends_with(self.paths.log, "Done")
 
     @property
     def log(self):
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to compare the speed of the vectorized `aggregator` in
+bin_discretizer.py with the original row by row version.
+
+It uses the simulated inventory (from 'tblAgeIndicators') of a large
+country if the output database is available on this machine, and
+otherwise a synthetic table of 20k rows with the same columns.
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/benchmarks/bench_bin_discretizer.py FR
+"""
+
+# Built-in modules #
+import sys, timeit
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.post_processor.bin_discretizer import aggregator, bin_to_discrete
+
+# Constants #
+iso2_code = sys.argv[1] if len(sys.argv) > 1 else 'FR'
+
+###############################################################################
+def reference_aggregator(df, sum_col, bin_col):
+    """The original implementation, one vector per row summed with padding."""
+    vectors = [bin_to_discrete(row[sum_col], row[bin_col]) for i, row in df.iterrows()]
+    result  = numpy.zeros(max(len(v) for v in vectors))
+    for v in vectors: result[:len(v)] += v
+    return result
+
+def load_inventory():
+    """The simulated inventory of the country or a synthetic replacement."""
+    try:
+        from cbmcfs3_runner.core.continent import continent
+        runner = continent[('static_demand', iso2_code, -1)]
+        if runner.post_processor.paths.mdb.exists:
+            return runner.post_processor.inventory.simulated
+    except (ImportError, KeyError):
+        pass
+    print("No output database for %s, using synthetic data." % iso2_code)
+    rng = numpy.random.RandomState(0)
+    num = 20000
+    return pandas.DataFrame({'time_step':   rng.randint(0, 30, num),
+                             'forest_type': rng.choice(list('ABCDEFGHIJ'), num),
+                             'ave_age':     rng.randint(0, 15, num) * 20.0 + 10.0,
+                             'area':        rng.exponential(100.0, num)})
+
+###############################################################################
+df      = load_inventory()
+groups  = [group for key, group in df.groupby(['time_step', 'forest_type'])]
+old     = lambda: [reference_aggregator(g, 'area', 'ave_age') for g in groups]
+new     = lambda: [aggregator(g, 'area', 'ave_age') for g in groups]
+
+# Check both give the same vectors #
+for a, b in zip(old(), new()): numpy.testing.assert_allclose(a, b, atol=1e-9)
+numpy.testing.assert_allclose(sum(v.sum() for v in new()), df['area'].sum())
+
+# Time #
+print("Rows: %i, groups: %i" % (len(df), len(groups)))
+t_old = min(timeit.repeat(old, number=1, repeat=3))
+t_new = min(timeit.repeat(new, number=1, repeat=3))
+print("Row by row: %.3f s" % t_old)
+print("Vectorized: %.3f s" % t_new)
+print("Speed-up:   %.1fx" % (t_old / t_new))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to compare the speed of `multi_index_pivot` in pump/common.py
+with the original version that pivoted on a column of Python tuples.
+
+It uses the disturbance matrix of a country's AIDB if it can be opened
+on this machine, and otherwise a synthetic table of ~110k rows with the
+same structure.
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/benchmarks/bench_multi_index_pivot.py AT
+"""
+
+# Built-in modules #
+import sys, timeit
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.pump.common import multi_index_pivot
+
+# Constants #
+iso2_code = sys.argv[1] if len(sys.argv) > 1 else 'AT'
+index     = ['dmid', 'dm_structure_id', 'dm_row', 'name', 'row_pool']
+
+###############################################################################
+def reference_pivot(df, columns=None, values=None):
+    """The original implementation, pivoting on tuples."""
+    names        = list(df.index.names)
+    df           = df.reset_index()
+    tuples_index = [tuple(i) for i in df[names].values]
+    df           = df.assign(tuples_index=tuples_index)
+    df           = df.pivot(index="tuples_index", columns=columns, values=values)
+    df.index     = pandas.MultiIndex.from_tuples(df.index, names=names)
+    df.columns.name = None
+    return df.reset_index()
+
+def load_long_table():
+    """The disturbance matrix of the country or a synthetic replacement."""
+    try:
+        from cbmcfs3_runner.core.continent import continent
+        aidb = continent.countries[iso2_code].aidb
+        if aidb.paths.aidb.exists:
+            df = aidb.dist_matrix_long.query('proportion>0')
+            df['column_pool'] = df['column_pool'].str.replace(' ', '_') + '_' + df['dm_column'].astype(str)
+            return df.set_index(index)
+    except (ImportError, KeyError):
+        pass
+    print("No AIDB for %s, using synthetic data." % iso2_code)
+    rng = numpy.random.RandomState(0)
+    num = 110000
+    df  = pandas.DataFrame({'dmid':            rng.randint(0, 500, num),
+                            'dm_structure_id': 1,
+                            'dm_row':          rng.randint(1, 26, num),
+                            'name':            rng.choice(['Clear cut', 'Thinning', 'Fire'], num),
+                            'row_pool':        'pool',
+                            'column_pool':     rng.randint(1, 26, num).astype(str),
+                            'proportion':      rng.uniform(size=num)})
+    df = df.drop_duplicates(index + ['column_pool'])
+    return df.set_index(index)
+
+###############################################################################
+df  = load_long_table()
+old = lambda: reference_pivot(df, columns='column_pool', values='proportion')
+new = lambda: multi_index_pivot(df, columns='column_pool', values='proportion')
+
+# Check both give the same table #
+pandas.testing.assert_frame_equal(old(), new(), check_dtype=False)
+
+# Check the same with a list of value columns #
+df['weight'] = df['proportion'] * 2
+old_list = reference_pivot(df, columns='column_pool', values=['proportion', 'weight'])
+new_list = multi_index_pivot(df, columns='column_pool', values=['proportion', 'weight'])
+# The levels of the column index are not stored in the same order #
+same_levels = lambda d: pandas.MultiIndex.from_tuples(list(d.columns), names=d.columns.names)
+old_list.columns, new_list.columns = same_levels(old_list), same_levels(new_list)
+pandas.testing.assert_frame_equal(old_list, new_list, check_dtype=False)
+assert list(new_list.columns.names) == [None, 'column_pool']
+df = df.drop(columns='weight')
+
+# Time #
+print("Rows: %i" % len(df))
+t_old = min(timeit.repeat(old, number=1, repeat=3))
+t_new = min(timeit.repeat(new, number=1, repeat=3))
+print("Tuples:        %.3f s" % t_old)
+print("Integer codes: %.3f s" % t_new)
+print("Speed-up:      %.1fx" % (t_old / t_new))
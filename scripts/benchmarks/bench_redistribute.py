@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to compare `redistribute` in bin_discretizer.py, which computes
+the new age bins of the simulated inventory analytically, with the
+discretized path that goes through `aggregator` and `grouped_binner`.
+
+It uses the simulated inventory (from 'tblAgeIndicators') of a large
+country if the output database is available on this machine, and
+otherwise a synthetic table of 20k rows with the same columns.
+
+Both versions must conserve the total area and produce the same bins.
+The areas in each bin differ only by the rounding of the ages to
+CBM_PRECISION done by the discretization.
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/benchmarks/bench_redistribute.py FR
+"""
+
+# Built-in modules #
+import sys, timeit
+
+# Third party modules #
+import numpy, pandas
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.post_processor.bin_discretizer import aggregator, grouped_binner, redistribute
+
+# Constants #
+iso2_code  = sys.argv[1] if len(sys.argv) > 1 else 'FR'
+group_cols = ['time_step', 'forest_type']
+sum_col    = 'area'
+bin_col    = 'ave_age'
+bin_width  = 20.0
+
+###############################################################################
+def discrete_bins(df):
+    """The discretized path, as in `Inventory.grouped_bins_discrete`."""
+    vectors = [dict(zip(group_cols, key), **{sum_col: aggregator(g, sum_col, bin_col)})
+               for key, g in df.groupby(group_cols, observed=True)]
+    return grouped_binner(pandas.DataFrame(vectors), group_cols, sum_col, bin_width)
+
+def load_inventory():
+    """The simulated inventory of the country or a synthetic replacement."""
+    try:
+        from cbmcfs3_runner.core.continent import continent
+        runner = continent[('static_demand', iso2_code, -1)]
+        if runner.post_processor.paths.mdb.exists:
+            return runner.post_processor.inventory.simulated
+    except (ImportError, KeyError):
+        pass
+    print("No output database for %s, using synthetic data." % iso2_code)
+    rng = numpy.random.RandomState(0)
+    num = 20000
+    return pandas.DataFrame({'time_step':   rng.randint(0, 30, num),
+                             'forest_type': rng.choice(list('ABCDEFGHIJ'), num),
+                             'ave_age':     rng.randint(0, 15, num) * 20.0 + 10.0,
+                             'area':        rng.exponential(100.0, num)})
+
+###############################################################################
+df  = load_inventory()
+old = lambda: discrete_bins(df)
+new = lambda: redistribute(df, group_cols, sum_col, bin_col, bin_width)
+
+# Check both conserve the area and give the same bins #
+a, b = old(), new()[['age_start', 'age_end', sum_col]]
+numpy.testing.assert_allclose(a[sum_col].sum(), df[sum_col].sum())
+numpy.testing.assert_allclose(b[sum_col].sum(), df[sum_col].sum())
+pandas.testing.assert_frame_equal(a[['age_start', 'age_end']], b[['age_start', 'age_end']],
+                                  check_dtype=False)
+print("Largest difference in a bin: %.3g" % (a[sum_col] - b[sum_col]).abs().max())
+
+# Time #
+print("Rows: %i" % len(df))
+t_old = min(timeit.repeat(old, number=1, repeat=3))
+t_new = min(timeit.repeat(new, number=1, repeat=3))
+print("Discretized: %.3f s" % t_old)
+print("Analytical:  %.3f s" % t_new)
+print("Speed-up:    %.1fx" % (t_old / t_new))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to check that the amounts of the future disturbances created by
+`DisturbanceMaker.demand_to_dist` are the ones allocated in `dist_irw`
+and `dist_fw`.
+
+Until this was fixed, `dist_fw_converted` (called by `check_dist_fw` at
+the start of `demand_to_dist`) overwrote the 'amount_m3' column of the
+cached `dist_irw` and `dist_fw` tables. The IRW disturbances then
+received the fuel wood generated by the IRW harvest, (owc + snag) times
+the volume, instead of the volume itself, and the FW disturbances were
+multiplied by (1 + snag + owc).
+
+For each country, this script prints how the disturbance amounts differ
+from the amounts the original code produced, and asserts that they now
+match the allocation tables.
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/checking/check_dist_amounts.py
+"""
+
+# Built-in modules #
+
+# Third party modules #
+import numpy
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+from cbmcfs3_runner.pre_processor.dist_maker import DisturbanceMaker
+
+###############################################################################
+def tonnes_of_carbon(df, amount_m3):
+    """Convert volumes over bark to tonnes of carbon like demand_to_dist."""
+    return amount_m3 * df['density'].values / 2
+
+for c in continent:
+    # Message #
+    print('\n--- Country %s ---' % c.iso2_code)
+
+    # Runner #
+    r = continent[('static_demand', c.iso2_code, -1)]
+
+    # A fresh disturbance maker so nothing is cached yet #
+    maker = DisturbanceMaker(r.pre_processor)
+
+    # The amounts as allocated, in the order demand_to_dist stacks them #
+    irw, fw  = maker.dist_irw.copy(), maker.dist_fw.copy()
+    expected = numpy.concatenate([tonnes_of_carbon(irw, irw['amount_m3'].values),
+                                  tonnes_of_carbon(fw,  fw['amount_m3'].values)])
+
+    # The amounts the original code handed to CBM #
+    irw_old  = (irw['owc_amount_from_irw'] + irw['snag_amount_from_irw']).values
+    fw_old   = (fw['amount_m3'] * (1 + fw['snag_perc'] + fw['owc_perc'])).values
+    original = numpy.concatenate([tonnes_of_carbon(irw, irw_old),
+                                  tonnes_of_carbon(fw,  fw_old)])
+
+    # The amounts we produce now #
+    actual = maker.demand_to_dist['amount'].values
+
+    # Report the change compared to the original #
+    print("Total amount originally: %.1f tC" % numpy.nansum(original))
+    print("Total amount now:        %.1f tC" % numpy.nansum(actual))
+
+    # Check #
+    numpy.testing.assert_allclose(actual, expected)
+    numpy.testing.assert_allclose(maker.dist_irw['amount_m3'], irw['amount_m3'])
+    numpy.testing.assert_allclose(maker.dist_fw['amount_m3'],  fw['amount_m3'])
@@ -5,6 +5,11 @@
 A script to copy ALL the cbmcfs3_data (input and output and all scenarios)
 from the AWS Windows machine to JRCbox.
 
+Only files that changed since the last copy are transferred. A manifest of
+checksums is kept at the destination of every country and every runner
+directory, as well as locally in a cache directory, so the source data is
+never modified (see cbmcfs3_runner/pump/sync.py).
+
 Typically you would run this file from a command line like this:
 
      ipython3.exe /deploy/cbmcfs3_runner/scripts/export/copy_output.py
@@ -15,30 +20,42 @@ or from repos:
 """
 
 # Built-in modules #
+import os
 
 # Third party modules #
-import pbs3
+from tqdm import tqdm
 
-# Excludes #
-exclude = ['--exclude', '.git']
+# First party modules #
 
+# Internal modules #
+from cbmcfs3_runner.pump.sync import Sync, RcloneTransport
 
-###############################################################################
-# Copy input data
-# Specify source and destination #
-source = "/repos/cbmcfs3_data/countries"
-destin = "jrcbox:" + "/Forbiomod/SourceData/EFDM/cbmcfs3_data/countries"
+# Constants #
+source_base = "/repos/cbmcfs3_data/"
+destin_base = "jrcbox:" + "/Forbiomod/SourceData/EFDM/cbmcfs3_data/"
+threads     = 4
 
-# Copy #
-rlcone = pbs3.Command('rclone.exe')
-rlcone('copyto', *exclude, source, destin)
+###############################################################################
+def sync_subdirectories(rel_dir):
+    """
+    Synchronize every subdirectory of `rel_dir` with its own manifest.
+    The files directly inside `rel_dir` are synchronized too, with a
+    manifest that excludes the subdirectories.
+    """
+    source_dir = source_base + rel_dir
+    subdirs    = [name for name in sorted(os.listdir(source_dir))
+                  if os.path.isdir(source_dir + name) and name != '.git']
+    # Subdirectories #
+    for name in tqdm(subdirs, desc=rel_dir):
+        transport = RcloneTransport(destin_base + rel_dir + name, 'rclone.exe')
+        Sync(source_dir + name, transport, threads=threads)()
+    # Top-level files #
+    transport = RcloneTransport(destin_base + rel_dir, 'rclone.exe')
+    Sync(source_dir, transport, threads=threads, exclude=['.git'] + subdirs)()
 
 ###############################################################################
-# Copy the historical scenario
-# Specify source and destination #
-source = "/repos/cbmcfs3_data/scenarios/historical"
-destin = "jrcbox:" + "/Forbiomod/SourceData/EFDM/cbmcfs3_data/scenarios/historical"
-
-# Copy #
-rlcone = pbs3.Command('rclone.exe')
-rlcone('copyto', *exclude, source, destin)
+# Copy input data #
+sync_subdirectories("countries/")
+
+# Copy the historical scenario, one runner directory per country #
+sync_subdirectories("scenarios/historical/")
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A script to save the standard post-processing outputs of every country
+and every scenario in the continent-level results store (partitioned
+Parquet datasets).
+
+Typically you would run this file from a command line like this:
+
+     ipython3.exe -i -- /deploy/cbmcfs3_runner/scripts/export/update_results_store.py
+
+Afterwards you can query all countries and scenarios at once like this:
+
+    >>> df = continent.results_store.query('merch_stock', years=[2030])
+"""
+
+# Built-in modules #
+
+# Third party modules #
+
+# First party modules #
+
+# Internal modules #
+from cbmcfs3_runner.core.continent import continent
+
+###############################################################################
+continent.results_store()